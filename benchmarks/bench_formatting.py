@@ -0,0 +1,114 @@
+"""
+Offline benchmark of `toggle_formatting` on synthetic documents.
+
+Run it from the root of the repository, so the `functions` package can be imported:
+
+    python -m benchmarks.bench_formatting
+    python -m benchmarks.bench_formatting --paragraphs 500 5000 --words 10 1000 --json baseline.json
+
+For each document size and word-list size the whole run is timed once (fetch, match, plan
+and send through a fake Docs service), then repeated under tracemalloc to measure the peak
+memory. The search throughput comes from the 'match' span of the run alone, over the text
+of every indexed paragraph, table cells included. Nothing is sent over the network.
+"""
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import tracemalloc
+from typing import List, Dict, Any
+
+from benchmarks.synthetic_docs import make_vocabulary, make_document, build_fake_service
+from functions import api_client
+from functions.api_client import TokenBucket
+from functions.doc_cache import document_cache
+from functions.undo_history import undo_history
+from functions.google_docs import toggle_formatting
+from functions.text_index import build_text_index
+from utils import metrics
+from utils.metrics import capture_runs
+
+DEFAULT_PARAGRAPHS = [100, 1000, 5000]
+DEFAULT_WORDS = [1, 10, 100, 1000]
+DEFAULT_RUNS = [1, 8]
+
+def run_once(paragraphs: int, runs: int, word_count: int, table_every: int, measure_memory: bool) -> Dict[str, Any]:
+    """Format a fresh synthetic document once and return the measures of the run."""
+    vocabulary = make_vocabulary()
+    document = make_document(paragraphs, runs_per_paragraph=runs, table_every=table_every, vocabulary=vocabulary)
+    words = random.Random(word_count).sample(vocabulary, word_count)
+    document_id = f"bench-{paragraphs}-{runs}-{word_count}"
+    service, http = build_fake_service({document_id: document})
+    document_cache.invalidate(document_id)
+    text_chars = sum(len(paragraph.text) for paragraph in build_text_index(document))  # Table cells included, as matched
+
+    if measure_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    with capture_runs() as records:
+        changes_count = toggle_formatting(service, document_id, words, {'bold': True, 'italic': True})
+    finished = time.perf_counter()
+    peak_bytes = tracemalloc.get_traced_memory()[1] if measure_memory else 0
+    if measure_memory:
+        tracemalloc.stop()
+
+    # The 'match' span only covers the search of the paragraphs, not the planning of the batches
+    match_seconds = records[-1]['spans']['match']
+    return {
+        'paragraphs': paragraphs,
+        'runs_per_paragraph': runs,
+        'words': word_count,
+        'text_chars': text_chars,
+        'changes': changes_count,
+        'seconds': finished - started,
+        'match_seconds': match_seconds,
+        'match_chars_per_second': text_chars / match_seconds if match_seconds > 0 else 0.0,
+        'batch_updates': len(http.batch_updates),
+        'requests': sum(len(body['requests']) for _, body in http.batch_updates),
+        'payload_bytes': http.bytes_sent,
+        'document_bytes': http.bytes_received,
+        'peak_memory_bytes': peak_bytes,
+    }
+
+def run_benchmarks(paragraph_counts: List[int], run_counts: List[int], word_counts: List[int], table_every: int) -> List[Dict[str, Any]]:
+    """Run every combination of the parameters and return the measures, printing them as they come."""
+    print(f"{'paragrafi':>9} {'run':>4} {'parole':>6} {'tempo':>8} {'ricerca':>8} {'car/s':>11} {'modifiche':>9} {'richieste':>9} {'blocchi':>7} {'payload':>10} {'memoria':>10}")
+    results = []
+    for paragraphs in paragraph_counts:
+        for runs in run_counts:
+            for word_count in word_counts:
+                result = run_once(paragraphs, runs, word_count, table_every, measure_memory=False)
+                result['peak_memory_bytes'] = run_once(paragraphs, runs, word_count, table_every, measure_memory=True)['peak_memory_bytes']
+                results.append(result)
+                print(
+                    f"{paragraphs:>9} {runs:>4} {word_count:>6} {result['seconds']:>7.3f}s {result['match_seconds']:>7.3f}s "
+                    f"{result['match_chars_per_second']:>11,.0f} {result['changes']:>9} {result['requests']:>9} {result['batch_updates']:>7} "
+                    f"{result['payload_bytes'] / 1024:>8.0f}KB {result['peak_memory_bytes'] / 1024 / 1024:>8.1f}MB"
+                )
+    return results
+
+def main(argv: List[str] = None) -> None:
+    parser = argparse.ArgumentParser(description="Benchmark offline di toggle_formatting su documenti sintetici.")
+    parser.add_argument('--paragraphs', type=int, nargs='+', default=DEFAULT_PARAGRAPHS, help="Numero di paragrafi dei documenti")
+    parser.add_argument('--runs', type=int, nargs='+', default=DEFAULT_RUNS, help="Numero di text run per paragrafo")
+    parser.add_argument('--words', type=int, nargs='+', default=DEFAULT_WORDS, help="Numero di parole da cercare")
+    parser.add_argument('--table-every', type=int, default=20, help="Inserisce una tabella ogni N paragrafi (0 per nessuna)")
+    parser.add_argument('--json', help="Salva i risultati in un file JSON, da usare come riferimento")
+    args = parser.parse_args(argv)
+
+    # No quota to respect offline, and neither the undo history nor the metrics log must end up in the working directory
+    metrics.METRICS_ENABLED = False
+    api_client.read_limiter = TokenBucket(1e9, 10**9)
+    api_client.write_limiter = TokenBucket(1e9, 10**9)
+    undo_history.directory = tempfile.mkdtemp(prefix='bolder-bench-')
+
+    results = run_benchmarks(args.paragraphs, args.runs, args.words, args.table_every)
+    if args.json:
+        with open(args.json, 'w') as file:
+            json.dump({'python': sys.version, 'results': results}, file, indent=2)
+        print(f"Risultati salvati in {args.json}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import json
+import random
+from urllib.parse import urlparse, parse_qs
+from typing import List, Dict, Any, Optional, Tuple
+
+# Styles given to the generated text runs, so the diff of the styles has work to do
+RUN_STYLES = ({}, {'bold': True}, {'italic': True}, {'bold': True, 'underline': True}, {'strikethrough': False})
+
+def make_vocabulary(size: int = 5000, seed: int = 0) -> List[str]:
+    """Return a list of distinct synthetic words of realistic length."""
+    rng = random.Random(seed)
+    letters = 'abcdefghilmnoprstuvz'
+    words = set()
+    while len(words) < size:
+        words.add(''.join(rng.choice(letters) for _ in range(rng.randint(3, 10))))
+    return sorted(words)
+
+def make_document(
+    paragraphs: int,  # The number of paragraphs in the body
+    runs_per_paragraph: int = 1,  # How many text runs each paragraph is fragmented into
+    words_per_paragraph: int = 60,  # The number of words of each paragraph
+    table_every: int = 0,  # Insert a table after every N paragraphs, 0 for none
+    vocabulary: Optional[List[str]] = None,  # The words the text is made of
+    seed: int = 0  # The seed of the random generator, so documents are reproducible
+) -> Dict[str, Any]:
+    """
+    Generate the JSON of a Google Document as returned by `documents.get`.
+
+    Each paragraph is split into `runs_per_paragraph` text runs with different styles; run
+    boundaries may fall inside words, as they do in real documents. Tables hold a 2x2 grid
+    of single-paragraph cells.
+
+    Returns:
+        Dict[str, Any]: The document, with consistent startIndex/endIndex values.
+    """
+    rng = random.Random(seed)
+    vocabulary = vocabulary or make_vocabulary(seed=seed)
+    content = [{'startIndex': 0, 'endIndex': 1, 'sectionBreak': {}}]
+    index = 1
+
+    def paragraph(text: str, runs: int) -> Dict[str, Any]:
+        nonlocal index
+        cuts = sorted(rng.sample(range(1, len(text)), min(runs - 1, len(text) - 1))) if runs > 1 else []
+        elements = []
+        for start, end in zip([0] + cuts, cuts + [len(text)]):
+            elements.append({
+                'startIndex': index + start,
+                'endIndex': index + end,
+                'textRun': {'content': text[start:end], 'textStyle': dict(rng.choice(RUN_STYLES))}
+            })
+        element = {'startIndex': index, 'endIndex': index + len(text), 'paragraph': {'elements': elements}}
+        index += len(text)
+        return element
+
+    for number in range(1, paragraphs + 1):
+        text = ' '.join(rng.choice(vocabulary) for _ in range(words_per_paragraph)) + '\n'
+        content.append(paragraph(text, runs_per_paragraph))
+
+        if table_every and number % table_every == 0:
+            table_start = index
+            index += 1  # The table start marker
+            rows = []
+            for _ in range(2):
+                row_start = index
+                index += 1  # The row start marker
+                cells = []
+                for _ in range(2):
+                    cell_start = index
+                    index += 1  # The cell start marker
+                    cell_text = ' '.join(rng.choice(vocabulary) for _ in range(5)) + '\n'
+                    cell_content = [paragraph(cell_text, 1)]
+                    cells.append({'startIndex': cell_start, 'endIndex': index, 'content': cell_content})
+                rows.append({'startIndex': row_start, 'endIndex': index, 'tableCells': cells})
+            content.append({'startIndex': table_start, 'endIndex': index, 'table': {'rows': 2, 'columns': 2, 'tableRows': rows}})
+
+    return {'documentId': '', 'revisionId': 'rev-0', 'body': {'content': content}}
+
+class FakeDocsHttp:
+    """
+    In-memory stand-in for the HTTP transport of a Docs API service object.
+
+    It is meant to be passed to `build_from_document`, so the requests go through the real
+    client library (URL building, JSON encoding and decoding) without touching the network.
+    `documents.get` returns the stored document and every `batchUpdate` body is recorded
+    and bumps the revision of the document.
+    """
+
+    def __init__(self, documents: Dict[str, Dict[str, Any]]) -> None:
+        self.documents = documents
+        self.batch_updates: List[Tuple[str, Dict[str, Any]]] = []  # (document ID, body) of each call
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self._revisions = {document_id: 0 for document_id in documents}
+
+    def request(self, uri: str, method: str = 'GET', body: Any = None, headers: Any = None, **kwargs: Any) -> Tuple[Any, bytes]:
+        import httplib2
+
+        url = urlparse(uri)
+        path = url.path.rsplit('/', 1)[-1]
+        document_id, _, action = path.partition(':')
+        document = self.documents.get(document_id)
+        if document is None:
+            return httplib2.Response({'status': 404}), b'{"error": {"code": 404, "message": "Not found"}}'
+
+        if method == 'POST' and action == 'batchUpdate':
+            self.bytes_sent += len(body or b'')
+            self.batch_updates.append((document_id, json.loads(body)))
+            self._revisions[document_id] += 1
+            document['revisionId'] = f"rev-{self._revisions[document_id]}"
+            payload = {'documentId': document_id, 'replies': [], 'writeControl': {'requiredRevisionId': document['revisionId']}}
+        elif parse_qs(url.query).get('fields') == ['revisionId']:
+            payload = {'revisionId': document['revisionId']}
+        else:
+            payload = document
+
+        content = json.dumps(payload).encode('utf-8')
+        self.bytes_received += len(content)
+        return httplib2.Response({'status': 200, 'content-type': 'application/json'}), content
+
+def build_fake_service(documents: Dict[str, Dict[str, Any]]) -> Tuple[Any, FakeDocsHttp]:
+    """Build a real Docs API service object on top of a FakeDocsHttp holding the documents."""
+    from googleapiclient.discovery import build_from_document
+    from functions.service_pool import _discovery_document, reuse_resources
+
+    http = FakeDocsHttp(documents)
+    for document_id, document in documents.items():
+        document['documentId'] = document_id
+    return reuse_resources(build_from_document(_discovery_document(), http=http)), http
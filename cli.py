@@ -0,0 +1,192 @@
+"""
+Headless entry point of Bolder, for scripts, scheduled jobs and servers without a display.
+
+    python cli.py --words "Roma,Milano" --favorite Verbale --bold
+    cat parole.txt | python cli.py --words-file - --all-favorites --bold --italic
+    python cli.py --words-file parole.txt --document https://docs.google.com/document/d/<ID>/edit --underline
+
+Words are separated by commas, as in the text box of the window, and here by newlines too,
+so a words file can hold one word per line. The formatting flags work like the checkboxes of
+the window: the requested styles are added to the matches that lack them, and the other
+styles are left as they are; with --overwrite, all the matches get the requested styles and
+lose the ones not requested. A JSON object is written to stdout as soon as each document is
+done, so the output can be piped while the run goes on; progress messages go to stderr. The
+exit status is 0 if every document was formatted, 1 if at least one failed and 2 for invalid
+arguments or missing credentials.
+
+Sign-in needs a browser, so the saved 'token.json' is used and never renewed interactively:
+start the graphical application once to create it.
+"""
+import re
+import sys
+import json
+import argparse
+from contextlib import redirect_stdout
+from typing import List, Dict, Tuple, Callable, Optional, TextIO
+from functions.favorites_store import load_favorites
+from functions.batch import apply_to_documents, DocumentResult, MAX_WORKERS
+from functions.google_docs import STYLE_FIELDS
+from functions.service_pool import ServicePool, POOL_SIZE
+from functions.auth import get_credentials, AuthenticationError
+from utils.metrics import request_profile
+
+# Exit statuses
+EXIT_OK = 0
+EXIT_FAILED_DOCUMENTS = 1
+EXIT_USAGE = 2
+
+DOCUMENT_URL_PATTERN = re.compile(r'/document/d/([\w-]+)')
+
+def parse_words(text: str) -> List[str]:
+    """Split a word list on commas and newlines, dropping the empty entries."""
+    return [word for line in text.splitlines() for word in line.split(',') if word.strip()]
+
+def document_id_from(value: str) -> str:
+    """Return the document ID of a Google Docs URL, or the value itself if it is already an ID."""
+    match = DOCUMENT_URL_PATTERN.search(value)
+    return match.group(1) if match else value.strip()
+
+def resolve_documents(
+    favorites: Dict[str, str],  # The saved favorites (name -> URL)
+    names: List[str],  # The favorites requested by name
+    all_favorites: bool,  # Whether to include every favorite
+    documents: List[str]  # Further documents, as URLs or IDs
+) -> List[Tuple[str, str]]:
+    """
+    Build the (name, document ID) pairs to format, without duplicates.
+
+    Raises:
+        KeyError: If a requested favorite does not exist.
+    """
+    missing = [name for name in names if name not in favorites]
+    if missing:
+        raise KeyError(f"Preferiti non trovati: {', '.join(missing)}")
+
+    selected = list(favorites) if all_favorites else names
+    pairs = [(name, document_id_from(favorites[name])) for name in selected]
+    pairs += [(value, document_id_from(value)) for value in documents]
+
+    seen = set()
+    unique = []
+    for name, document_id in pairs:
+        if document_id not in seen:
+            seen.add(document_id)
+            unique.append((name, document_id))
+    return unique
+
+def result_record(result: DocumentResult) -> Dict[str, object]:
+    """Convert the result of a document to the JSON object written on its output line."""
+    return {
+        'name': result.name,
+        'document_id': result.document_id,
+        'changes': result.changes_count,
+        'error': result.error,
+        'seconds': round(result.seconds, 3),
+    }
+
+def format_documents(
+    documents: List[Tuple[str, str]],  # The (name, document ID) pairs to format
+    words: List[str],  # A list of words to format
+    formatting_options: Dict[str, bool],  # Formatting options (e.g., {'bold': True, 'italic': False})
+    ignore_case: bool = False,  # Whether to ignore case when matching words
+    diff: bool = True,  # Whether to only send the styles that would actually change
+    max_workers: int = MAX_WORKERS,  # The maximum number of documents processed at the same time
+    on_result: Optional[Callable[[DocumentResult], None]] = None,  # Called as soon as each document is done
+    service_pool: Optional[ServicePool] = None  # The pool to use, by default one on the saved credentials
+) -> List[DocumentResult]:
+    """
+    Format several documents without any window, for use from other Python programs.
+
+    Raises:
+        AuthenticationError: If no pool is given and the saved credentials are missing or expired.
+
+    Returns:
+        List[DocumentResult]: The result of each document, in the order of `documents`.
+    """
+    if service_pool is None:
+        service_pool = ServicePool(get_credentials(interactive=False), size=max(POOL_SIZE, max_workers))
+    return apply_to_documents(service_pool, documents, words, formatting_options, ignore_case, diff, max_workers, on_result=on_result)
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Formatta le parole indicate nei documenti Google, senza interfaccia grafica.")
+    parser.add_argument('--words', action='append', default=[], help="Parole da formattare, separate da virgole (ripetibile)")
+    parser.add_argument('--words-file', action='append', default=[], metavar='FILE', help="File con le parole, separate da virgole o a capo; '-' per lo standard input (ripetibile)")
+    parser.add_argument('--favorite', action='append', default=[], metavar='NOME', help="Nome di un preferito da formattare (ripetibile)")
+    parser.add_argument('--all-favorites', action='store_true', help="Formatta tutti i preferiti")
+    parser.add_argument('--document', action='append', default=[], metavar='URL', help="URL o ID di un documento da formattare (ripetibile)")
+    for field in STYLE_FIELDS:
+        parser.add_argument(f'--{field}', action='store_true', help=f"Applica lo stile {field}")
+    parser.add_argument('--ignore-case', action='store_true', help="Ignora maiuscole e minuscole")
+    parser.add_argument('--overwrite', action='store_true', help="Invia lo stile a tutte le occorrenze, anche a quelle già formattate, togliendo gli stili non richiesti")
+    parser.add_argument('--workers', type=int, default=MAX_WORKERS, help="Numero di documenti elaborati contemporaneamente")
+    parser.add_argument('--profile', metavar='FILE', help="Salva un profilo cProfile della prima formattazione")
+    return parser
+
+def main(argv: Optional[List[str]] = None, stdin: Optional[TextIO] = None, stdout: Optional[TextIO] = None) -> int:
+    """
+    Run the command line and return its exit status.
+
+    Args:
+        argv (Optional[List[str]]): The arguments, by default those of the process.
+        stdin (Optional[TextIO]): Where '--words-file -' reads from, by default the standard input.
+        stdout (Optional[TextIO]): Where the JSON lines are written, by default the standard
+            output; everything else goes to stderr.
+    """
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    words = [word for value in args.words for word in parse_words(value)]
+    for path in args.words_file:
+        try:
+            if path == '-':
+                words += parse_words(stdin.read())
+            else:
+                with open(path, 'r', encoding='utf-8') as file:
+                    words += parse_words(file.read())
+        except OSError as e:
+            print(f"Impossibile leggere le parole da {path}: {e}", file=sys.stderr)
+            return EXIT_USAGE
+    if not words:
+        print("Inserisci almeno una parola con --words o --words-file.", file=sys.stderr)
+        return EXIT_USAGE
+
+    try:
+        favorites = load_favorites() if args.favorite or args.all_favorites else {}
+    except (OSError, ValueError) as e:
+        print(f"Impossibile leggere i preferiti: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    try:
+        documents = resolve_documents(favorites, args.favorite, args.all_favorites, args.document)
+    except KeyError as e:
+        print(e.args[0], file=sys.stderr)
+        return EXIT_USAGE
+    if not documents:
+        print("Indica almeno un documento con --favorite, --all-favorites o --document.", file=sys.stderr)
+        return EXIT_USAGE
+
+    if args.profile:
+        request_profile(args.profile)
+
+    formatting_options = {field: getattr(args, field) for field in STYLE_FIELDS}
+
+    def write_result(result: DocumentResult) -> None:
+        stdout.write(json.dumps(result_record(result), ensure_ascii=False) + '\n')
+        stdout.flush()
+
+    # The library reports its progress with print: keep it out of the JSON lines
+    with redirect_stdout(sys.stderr):
+        try:
+            results = format_documents(
+                documents, words, formatting_options, args.ignore_case, not args.overwrite,
+                max(1, args.workers), on_result=write_result
+            )
+        except AuthenticationError as e:
+            print(e, file=sys.stderr)
+            return EXIT_USAGE
+
+    return EXIT_FAILED_DOCUMENTS if any(result.error for result in results) else EXIT_OK
+
+if __name__ == '__main__':
+    sys.exit(main())
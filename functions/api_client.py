@@ -0,0 +1,137 @@
+import time
+import random
+import threading
+from collections import deque
+from typing import Any, Dict, Optional
+from googleapiclient.errors import HttpError
+from utils.metrics import count
+
+# Docs API quota per user, shared by all the threads of the application. The limiters stay
+# slightly below the quota to leave room for other clients of the same account.
+READ_QUOTA_PER_MINUTE = 300
+WRITE_QUOTA_PER_MINUTE = 60
+READS_PER_MINUTE = 240
+WRITES_PER_MINUTE = 50
+BURST_SIZE = 10
+
+# Retry policy for quota errors and transient server errors
+MAX_RETRIES = 5
+INITIAL_BACKOFF = 1.0
+MAX_BACKOFF = 32.0
+RETRYABLE_STATUSES = (429, 500, 502, 503, 504)
+
+class TokenBucket:
+    """Thread-safe token bucket that spreads the calls to stay under a rate."""
+
+    def __init__(self, rate_per_second: float, capacity: int) -> None:
+        self.rate_per_second = rate_per_second
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Take a token, waiting for it if needed, and return the time spent waiting."""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate_per_second)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate_per_second
+            time.sleep(delay)
+            waited += delay
+
+class ApiStats:
+    """Thread-safe counters of the calls made through the API client."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._counters = {'calls': 0, 'retries': 0, 'throttled': 0, 'throttle_seconds': 0.0, 'quota_errors': 0, 'server_errors': 0}
+        self._recent = {'read': deque(), 'write': deque()}  # Timestamps of the calls of the last minute
+
+    def add(self, name: str, value: float = 1) -> None:
+        """Increment a counter."""
+        with self._lock:
+            self._counters[name] += value
+
+    def record_call(self, kind: str) -> None:
+        """Record a 'read' or 'write' call for the per-minute quota usage."""
+        now = time.monotonic()
+        with self._lock:
+            self._counters['calls'] += 1
+            recent = self._recent[kind]
+            recent.append(now)
+            while recent[0] < now - 60:
+                recent.popleft()
+
+    def snapshot(self) -> Dict[str, float]:
+        """Return a copy of the counters and the share of the per-minute quota used."""
+        now = time.monotonic()
+        with self._lock:
+            snapshot = dict(self._counters)
+            for kind, quota in (('read', READ_QUOTA_PER_MINUTE), ('write', WRITE_QUOTA_PER_MINUTE)):
+                recent = sum(1 for timestamp in self._recent[kind] if timestamp >= now - 60)
+                snapshot[f'{kind}s_last_minute'] = recent
+                snapshot[f'{kind}_quota_usage'] = recent / quota
+            return snapshot
+
+read_limiter = TokenBucket(READS_PER_MINUTE / 60, BURST_SIZE)
+write_limiter = TokenBucket(WRITES_PER_MINUTE / 60, BURST_SIZE)
+api_stats = ApiStats()
+
+def _retry_after(error: HttpError) -> Optional[float]:
+    """Return the delay requested by the server through the Retry-After header, if any."""
+    value = error.resp.get('retry-after') if error.resp is not None else None
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None  # HTTP dates are not used by Google APIs
+
+def execute(request: Any, http: Any = None) -> Any:
+    """
+    Execute a Google API request through the shared rate limiter, retrying quota and server errors.
+
+    GET requests count against the read quota and the others against the write quota. Retries
+    use exponential backoff with full jitter, or the delay of the Retry-After header when the
+    server sends one. Non-retryable errors and the last failure are raised unchanged.
+
+    Args:
+        request (Any): The HttpRequest built by the service object.
+        http (Any): The HTTP transport to use instead of the one of the service object.
+
+    Returns:
+        Any: The deserialized response.
+    """
+    kind = 'read' if getattr(request, 'method', 'GET') == 'GET' else 'write'
+    limiter = read_limiter if kind == 'read' else write_limiter
+
+    backoff = INITIAL_BACKOFF
+    for attempt in range(MAX_RETRIES + 1):
+        waited = limiter.acquire()
+        if waited:
+            api_stats.add('throttled')
+            api_stats.add('throttle_seconds', waited)
+            count('throttle_seconds', waited)
+        api_stats.record_call(kind)
+        count(f'api_{kind}s')
+
+        try:
+            return request.execute(http=http) if http is not None else request.execute()
+        except HttpError as error:
+            status = error.resp.status if error.resp is not None else None
+            if status not in RETRYABLE_STATUSES or attempt == MAX_RETRIES:
+                raise
+            api_stats.add('quota_errors' if status == 429 else 'server_errors')
+
+            delay = _retry_after(error)
+            if delay is None:
+                delay = random.uniform(0, backoff)
+                backoff = min(backoff * 2, MAX_BACKOFF)
+            print(f"Errore {status} dall'API, nuovo tentativo tra {delay:.1f}s")
+            api_stats.add('retries')
+            count('retries')
+            time.sleep(delay)
@@ -1,16 +1,31 @@
 import os
 import sys
-from typing import Any
-from tkinter import messagebox
-from google.oauth2.credentials import Credentials
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
+from typing import Any, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
 
 SCOPES = ['https://www.googleapis.com/auth/documents']
 
-def authenticate_google() -> Any:
-    """Authenticate the user with Google and return the service object."""
+class AuthenticationError(Exception):
+    """Raised when valid credentials are needed but the user cannot be asked to sign in."""
+
+def get_credentials(interactive: bool = True) -> 'Credentials':
+    """
+    Authenticate the user with Google and return the credentials.
+
+    Args:
+        interactive (bool): Whether the browser sign-in may be started when 'token.json' is
+            missing or cannot be refreshed. Without a display it must be False.
+
+    Raises:
+        AuthenticationError: If sign-in is needed and `interactive` is False.
+    """
+    # Imported here: the Google auth modules are slow to load and not needed to show the window
+    from google.oauth2.credentials import Credentials
+    from google_auth_oauthlib.flow import InstalledAppFlow
+    from google.auth.transport.requests import Request
+
     creds = None
     if os.path.exists('token.json'):
         try:
@@ -22,12 +37,24 @@ def authenticate_google() -> Any:
             creds = None  # Force reauthentication if refresh fails
 
     if not creds or not creds.valid:
+        if not interactive:
+            raise AuthenticationError("Credenziali mancanti o scadute: avvia Bolder una volta con l'interfaccia grafica per accedere a Google.")
         flow = InstalledAppFlow.from_client_secrets_file('credentials.json', SCOPES)
         creds = flow.run_local_server(port=0)
         with open('token.json', 'w') as token:
             token.write(creds.to_json())
 
-    return build('docs', 'v1', credentials=creds)
+    return creds
+
+def build_service(creds: 'Credentials') -> Any:
+    """Build a Google Docs API service object for the given credentials, using the bundled discovery document."""
+    from googleapiclient.discovery import build_from_document
+    from functions.service_pool import _discovery_document, reuse_resources
+    return reuse_resources(build_from_document(_discovery_document(), credentials=creds))
+
+def authenticate_google() -> Any:
+    """Authenticate the user with Google and return the service object."""
+    return build_service(get_credentials())
 
 def check_env(current_version: str) -> None:
     """
@@ -38,6 +65,8 @@ def check_env(current_version: str) -> None:
     Raises:
         SystemExit: Exits the program with status code 1 if 'credentials.json' is missing.
     """
+    from tkinter import messagebox  # Imported here, so the module can be used without a display
+
     if current_version == "__VERSION_NAME__":
         # Show an error message and exit the program
         messagebox.showerror("Errore", "Versione sconosciuta di Bolder. Il programma verrà terminato.")
@@ -0,0 +1,71 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Tuple, Callable, NamedTuple, Optional
+from functions.google_docs import toggle_formatting, ProgressCallback
+from functions.service_pool import ServicePool
+from functions.jobs import JobCancelled
+
+# Maximum number of documents processed at the same time
+MAX_WORKERS = 4
+
+class DocumentResult(NamedTuple):
+    """The outcome of the formatting of a single document."""
+    name: str  # The name of the favorite
+    document_id: str  # The ID of the Google Document
+    changes_count: Optional[int]  # The number of changes made, None if the document failed
+    error: Optional[str]  # The error message, None if the document succeeded
+    seconds: float  # The time spent on the document
+
+def apply_to_documents(
+    service_pool: ServicePool,  # The pool of Google Docs API service objects
+    documents: List[Tuple[str, str]],  # The (name, document ID) pairs to format
+    words: List[str],  # A list of words to format
+    formatting_options: Dict[str, bool],  # Formatting options (e.g., {'bold': True, 'italic': False})
+    ignore_case: bool = False,  # Whether to ignore case when matching words
+    diff: bool = True,  # Whether to only send the styles that would actually change
+    max_workers: int = MAX_WORKERS,  # The maximum number of documents processed at the same time
+    on_result: Optional[Callable[[DocumentResult], None]] = None,  # Called as soon as each document is done
+    on_progress: Optional[ProgressCallback] = None  # Passed to the formatting of each document
+) -> List[DocumentResult]:
+    """
+    Apply the same formatting to several documents on a bounded pool of worker threads.
+
+    Each document leases its own service object from the pool, since the underlying HTTP
+    transport is not thread-safe. A failing document is reported in its result and does not
+    stop the others. An exception raised by `on_progress` stops the document being formatted
+    and is reported in its result, like any other error, except JobCancelled: a cancellation
+    stops the whole run, dropping the documents not started yet, and is raised to the caller.
+
+    Returns:
+        List[DocumentResult]: The result of each document, in the order of `documents`.
+
+    Raises:
+        JobCancelled: If `on_progress` cancelled the run.
+    """
+    def format_document(name: str, document_id: str) -> DocumentResult:
+        started = time.perf_counter()
+        try:
+            with service_pool.lease() as service:
+                changes_count = toggle_formatting(service, document_id, words, formatting_options, ignore_case, diff, on_progress)
+            return DocumentResult(name, document_id, changes_count, None, time.perf_counter() - started)
+        except JobCancelled:
+            raise
+        except Exception as error:
+            print(f"Errore su {name}: {error}")
+            return DocumentResult(name, document_id, None, str(error), time.perf_counter() - started)
+
+    results = {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(documents)))) as executor:
+        futures = {executor.submit(format_document, name, document_id): position for position, (name, document_id) in enumerate(documents)}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except JobCancelled:
+                for pending in futures:
+                    pending.cancel()
+                raise
+            results[futures[future]] = result
+            if on_result:
+                on_result(result)
+
+    return [results[position] for position in range(len(documents))]
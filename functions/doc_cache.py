@@ -0,0 +1,153 @@
+import os
+import json
+import threading
+from array import array
+from collections import OrderedDict
+from typing import List, Dict, Any, Optional
+from functions.text_index import ParagraphIndex, index_by_segment, overlapping_paragraphs, range_segment
+
+MAX_CACHED_DOCUMENTS = 32
+CACHE_FORMAT = 1  # Version of the on-disk entries, for a future change of their layout
+
+class CachedDocument:
+    """The text index of a document at a given revision."""
+
+    __slots__ = ('revision_id', 'paragraphs')
+
+    def __init__(self, revision_id: str, paragraphs: List[ParagraphIndex]) -> None:
+        self.revision_id = revision_id
+        self.paragraphs = paragraphs
+
+class DocumentCache:
+    """
+    LRU cache of document text indexes keyed by document ID and revisionId.
+
+    Entries are never modified: updating a document replaces its entry, so a caller keeps
+    a consistent snapshot even if another thread updates the same document. When
+    `cache_dir` is set, entries are also stored on disk and survive a restart.
+    """
+
+    def __init__(self, max_entries: int = MAX_CACHED_DOCUMENTS, cache_dir: Optional[str] = None) -> None:
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self._entries: 'OrderedDict[str, CachedDocument]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, document_id: str, revision_id: Optional[str] = None) -> Optional[CachedDocument]:
+        """
+        Return the cached document, or None if it is missing or not at the given revision.
+
+        Args:
+            document_id (str): The ID of the Google Document.
+            revision_id (Optional[str]): The expected revision, or None to accept any revision.
+        """
+        with self._lock:
+            entry = self._entries.get(document_id)
+            if entry is not None:
+                self._entries.move_to_end(document_id)
+
+        if entry is None and self.cache_dir:
+            entry = self._load(document_id)
+            if entry is not None:
+                self._store(document_id, entry)
+
+        if entry is None or (revision_id is not None and entry.revision_id != revision_id):
+            return None
+        return entry
+
+    def put(self, document_id: str, entry: CachedDocument) -> None:
+        """Store the text index of a document, replacing the previous revision."""
+        if not entry.revision_id:
+            return  # Without a revision the entry could never be validated
+        self._store(document_id, entry)
+        if self.cache_dir:
+            self._save(document_id, entry)
+
+    def invalidate(self, document_id: str) -> None:
+        """Drop a document from the cache."""
+        with self._lock:
+            self._entries.pop(document_id, None)
+        if self.cache_dir:
+            try:
+                os.remove(self._path(document_id))
+            except FileNotFoundError:
+                pass
+
+    def apply_updates(self, document_id: str, previous_revision_id: str, revision_id: Optional[str], requests: List[Dict[str, Any]]) -> None:
+        """
+        Update a cached document in place after a batchUpdate of text styles.
+
+        Args:
+            document_id (str): The ID of the Google Document.
+            previous_revision_id (str): The revision the requests were applied to.
+            revision_id (Optional[str]): The revision returned by the batchUpdate.
+            requests (List[Dict[str, Any]]): The requests sent in the batchUpdate.
+        """
+        entry = self.get(document_id, previous_revision_id)
+        if entry is None:
+            return
+        if not revision_id or any('updateTextStyle' not in request for request in requests):
+            self.invalidate(document_id)
+            return
+
+        paragraphs = list(entry.paragraphs)
+        lookup = index_by_segment(paragraphs)
+        for request in requests:
+            update = request['updateTextStyle']
+            start_index = update['range']['startIndex']
+            end_index = update['range']['endIndex']
+            # The fields of the mask missing from the style are reset by the API
+            text_style = {field: update['textStyle'].get(field) for field in update['fields'].split(',')}
+            for position in overlapping_paragraphs(lookup, range_segment(update['range']), start_index, end_index):
+                paragraphs[position] = paragraphs[position].with_text_style(start_index, end_index, text_style)
+
+        self.put(document_id, CachedDocument(revision_id, paragraphs))
+
+    def _store(self, document_id: str, entry: CachedDocument) -> None:
+        """Store an entry in memory, evicting the least recently used ones."""
+        with self._lock:
+            self._entries[document_id] = entry
+            self._entries.move_to_end(document_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _path(self, document_id: str) -> str:
+        """Return the path of the on-disk entry of a document."""
+        return os.path.join(self.cache_dir, f"{document_id}.json")
+
+    def _load(self, document_id: str) -> Optional[CachedDocument]:
+        """Load an entry from disk, ignoring missing or unreadable files."""
+        try:
+            with open(self._path(document_id), 'r', encoding='utf-8') as file:
+                data = json.load(file)
+            if data.get('format') != CACHE_FORMAT:
+                return None
+            paragraphs = [
+                ParagraphIndex(text, array('l', offsets), array('l', start_indexes), styles, tuple(segment))
+                for text, offsets, start_indexes, styles, segment in data['paragraphs']
+            ]
+            return CachedDocument(data['revisionId'], paragraphs)
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+
+    def _save(self, document_id: str, entry: CachedDocument) -> None:
+        """Write an entry to disk through a temporary file, so readers never see a partial file."""
+        data = {
+            'format': CACHE_FORMAT,
+            'revisionId': entry.revision_id,
+            'paragraphs': [
+                [paragraph.text, paragraph.offsets.tolist(), paragraph.start_indexes.tolist(), paragraph.styles, paragraph.segment]
+                for paragraph in entry.paragraphs
+            ]
+        }
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            temp_path = self._path(document_id) + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(data, file)
+            os.replace(temp_path, self._path(document_id))
+        except OSError as e:
+            print(f"Impossibile salvare la cache del documento: {e}")
+
+# Cache shared by all the formatting runs of the application
+document_cache = DocumentCache()
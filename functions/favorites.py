@@ -1,12 +1,16 @@
-import os
-import json
+import queue
+import threading
 import tkinter as tk
 from tkinter import messagebox, filedialog
 from tkinter import ttk
-from utils.styles import configure_styles, dark_bg, dark_fg
-from typing import Dict, Callable, Optional
-
-FAVORITES_FILE = "favorites.json"
+from utils.styles import configure_styles, dark_bg, dark_fg, accent_color
+from functions.favorites_model import FavoritesModel, Change
+from functions.favorites_search import FavoritesSearchIndex
+from functions.favorites_store import save_favorites, bulk_save
+from functions.importer import ImportEntry, STATUS_OK, parse_import_file, validate_entries, document_url
+from functions.service_pool import ServicePool
+from concurrent.futures import Future
+from typing import Dict, List, Optional
 
 def open_favorite_dialog(title: str, initial_name: str = "", initial_url: str = "") -> Dict[str, Optional[str]]:
     """Open a dialog window with two text fields for name and URL."""
@@ -58,26 +62,259 @@ def open_favorite_dialog(title: str, initial_name: str = "", initial_url: str =
 
     return result
 
-def add_favorite(favorites: Dict[str, str], update_favorites_list: Callable[[], None]) -> None:
+def select_favorites_dialog(favorites: Dict[str, str]) -> List[str]:
+    """Open a dialog window to select several favorites at once."""
+    dialog = tk.Toplevel()
+    dialog.title("Seleziona Preferiti")
+    dialog.geometry("400x400")
+    dialog.configure(bg=dark_bg)
+
+    # Configure styles
+    configure_styles()
+
+    content_frame = tk.Frame(dialog, bg=dark_bg, padx=20, pady=10)
+    content_frame.pack(fill="both", expand=True)
+
+    tk.Label(content_frame, text="Documenti da elaborare:", bg=dark_bg, fg=dark_fg).pack(pady=5, anchor="w")
+    listbox = tk.Listbox(content_frame, selectmode=tk.EXTENDED, bg=dark_bg, fg=dark_fg, selectbackground=accent_color, selectforeground=dark_bg)
+    listbox.pack(fill="both", expand=True)
+    for name in favorites:
+        listbox.insert("end", name)
+
+    result = []
+
+    def on_submit():
+        selected = [listbox.get(index) for index in listbox.curselection()]
+        if not selected:
+            messagebox.showerror("Errore", "Seleziona almeno un documento.")
+            return
+        result.extend(selected)
+        dialog.destroy()
+
+    button_frame = tk.Frame(content_frame, bg=dark_bg, pady=10)
+    button_frame.pack()
+
+    ttk.Button(button_frame, text="Seleziona tutti", command=lambda: listbox.selection_set(0, "end"), style="Accent.TButton").pack(side="left", padx=5)
+    ttk.Button(button_frame, text="Conferma", command=on_submit, style="Accent.TButton").pack(side="left", padx=5)
+    ttk.Button(button_frame, text="Annulla", command=dialog.destroy, style="Accent.TButton").pack(side="left", padx=5)
+
+    dialog.transient()
+    dialog.grab_set()
+    dialog.wait_window()
+
+    return result
+
+class FavoritesListView:
+    """
+    Keeps a Listbox in sync with the favorites, optionally filtered by a search query.
+
+    Without a query only the rows affected by a change are touched. With a query the
+    Listbox shows the ranked results of the search index; rows always map back to the
+    favorites by name, so selection, editing and drag-reorder act on the unfiltered order.
+    """
+
+    def __init__(self, favorites: FavoritesModel, listbox: tk.Listbox) -> None:
+        self.favorites = favorites
+        self.listbox = listbox
+        self.search_index = FavoritesSearchIndex(favorites)
+        self.query = ''
+        self._rows: Optional[List[str]] = None  # The names shown when filtered, None when not
+        self._row_positions: Dict[str, int] = {}
+        self._render()
+        favorites.subscribe(self._on_change)
+
+    @property
+    def filtered(self) -> bool:
+        """Whether the Listbox currently shows a subset of the favorites."""
+        return self._rows is not None
+
+    def name_at(self, row: int) -> str:
+        """Return the name of the favorite shown at a row."""
+        return self._rows[row] if self._rows is not None else self.favorites.name_at(row)
+
+    def row_of(self, name: str) -> Optional[int]:
+        """Return the row showing a favorite, or None if it is filtered out."""
+        if self._rows is not None:
+            return self._row_positions.get(name)
+        return self.favorites.index(name) if name in self.favorites else None
+
+    def select(self, name: str) -> None:
+        """Select the row of a favorite, if it is visible."""
+        self.listbox.selection_clear(0, "end")
+        row = self.row_of(name)
+        if row is not None:
+            self.listbox.selection_set(row)
+            self.listbox.activate(row)
+            self.listbox.see(row)
+
+    def set_query(self, query: str) -> None:
+        """Filter the favorites with a search query; an empty query shows them all."""
+        self.query = query.strip()
+        self._render()
+
+    def _render(self) -> None:
+        """Fill the Listbox from scratch, keeping the selected favorite selected."""
+        selection = self.listbox.curselection()
+        selected_name = self.listbox.get(selection[0]) if selection else None
+
+        if self.query:
+            self._rows = self.search_index.search(self.query)
+            self._row_positions = {name: row for row, name in enumerate(self._rows)}
+        else:
+            self._rows = None
+            self._row_positions = {}
+        self.listbox.delete(0, "end")
+        if self._rows is not None or len(self.favorites):
+            self.listbox.insert("end", *(self._rows if self._rows is not None else self.favorites))
+
+        if selected_name is not None:
+            self.select(selected_name)
+
+    def _on_change(self, change: Change) -> None:
+        """Update the Listbox after a change of the favorites."""
+        if self._rows is not None:
+            self._render()  # The ranking may change: the search is fast enough to run again
+            return
+
+        kind, index, name, extra = change
+        if kind == 'insert':
+            self.listbox.insert(index, name)
+        elif kind == 'delete':
+            self.listbox.delete(index)
+        elif kind in ('rename', 'move'):
+            old_index = extra if kind == 'move' else index
+            was_selected = self.listbox.selection_includes(old_index)
+            self.listbox.delete(old_index)
+            self.listbox.insert(index, name)
+            if was_selected:
+                self.listbox.selection_set(index)
+                self.listbox.activate(index)
+        else:
+            self._render()
+
+def add_favorite(favorites: FavoritesModel) -> None:
     """Add a new favorite with a single dialog for name and URL."""
     name, url = open_favorite_dialog("Aggiungi Preferito").values()
     if name and url:
         favorites[name] = url
         save_favorites(favorites)
-        update_favorites_list()
         messagebox.showinfo("Successo", "Preferito aggiunto con successo.")
 
-def remove_favorite(favorites: Dict[str, str], favorites_listbox: tk.Listbox, update_favorites_list: Callable[[], None]) -> None:
+def remove_favorite(favorites: FavoritesModel, favorites_view: FavoritesListView) -> None:
     """Remove a selected favorite from the list."""
-    selected = favorites_listbox.curselection()
+    selected = favorites_view.listbox.curselection()
     if selected:
-        name = favorites_listbox.get(selected)
+        name = favorites_view.name_at(selected[0])
         del favorites[name]
         save_favorites(favorites)
-        update_favorites_list()
 
-def import_favorite(favorites: Dict[str, str], update_favorites_list: Callable[[], None]) -> None:
-    """Import favorites from a .txt file and save them to the JSON file."""
+def import_progress_dialog(service_pool: 'Future[ServicePool]', entries: List[ImportEntry]) -> Optional[List[ImportEntry]]:
+    """
+    Validate the imported entries in a background thread, showing the progress.
+
+    Returns:
+        Optional[List[ImportEntry]]: The validated entries, or None if the validation failed.
+    """
+    dialog = tk.Toplevel()
+    dialog.title("Verifica dei documenti")
+    dialog.geometry("400x120")
+    dialog.configure(bg=dark_bg)
+    configure_styles()
+
+    status_label = tk.Label(dialog, text="Connessione a Google...", bg=dark_bg, fg=dark_fg)
+    status_label.pack(pady=10)
+    progress = ttk.Progressbar(dialog, mode="determinate", length=340)
+    progress.pack(pady=5)
+
+    # The worker only puts messages in the queue: the widgets are updated by the main thread
+    updates: queue.Queue = queue.Queue()
+    result: List[ImportEntry] = []
+
+    def validate() -> None:
+        try:
+            with service_pool.result().lease() as service:
+                validated = validate_entries(service, entries, lambda checked, total: updates.put(('progress', checked, total)))
+            updates.put(('done', validated, None))
+        except Exception as e:
+            updates.put(('error', e, None))
+
+    def poll() -> None:
+        try:
+            while True:
+                kind, value, total = updates.get_nowait()
+                if kind == 'progress':
+                    progress.configure(maximum=max(total, 1), value=value)
+                    status_label.configure(text=f"Documenti verificati: {value}/{total}")
+                elif kind == 'done':
+                    result.extend(value)
+                    dialog.destroy()
+                    return
+                else:
+                    messagebox.showerror("Errore", f"Impossibile verificare i documenti: {value}")
+                    dialog.destroy()
+                    return
+        except queue.Empty:
+            pass
+        dialog.after(100, poll)
+
+    threading.Thread(target=validate, daemon=True).start()
+    dialog.after(100, poll)
+    dialog.transient()
+    dialog.grab_set()
+    dialog.wait_window()
+
+    return result or None
+
+def import_report_dialog(entries: List[ImportEntry]) -> bool:
+    """Show the outcome of each imported line and ask whether to import the valid ones."""
+    valid_count = sum(entry.status == STATUS_OK for entry in entries)
+
+    dialog = tk.Toplevel()
+    dialog.title("Importazione da Bolder 1")
+    dialog.geometry("600x400")
+    dialog.configure(bg=dark_bg)
+    configure_styles()
+
+    content_frame = tk.Frame(dialog, bg=dark_bg, padx=20, pady=10)
+    content_frame.pack(fill="both", expand=True)
+
+    tk.Label(content_frame, text=f"Documenti validi: {valid_count} su {len(entries)} righe", bg=dark_bg, fg=dark_fg).pack(pady=5, anchor="w")
+    report = tk.Text(content_frame, bg=dark_bg, fg=dark_fg, wrap="none", height=15)
+    report.pack(fill="both", expand=True)
+    report.tag_configure("error", foreground="red")
+    for entry in entries:
+        details = f"{entry.status} ({entry.title})" if entry.status == STATUS_OK and entry.title else entry.status
+        report.insert("end", f"Riga {entry.line_number}: {entry.name} - {details}\n", () if entry.status == STATUS_OK else ("error",))
+    report.configure(state="disabled")
+
+    confirmed = []
+
+    def on_submit():
+        confirmed.append(True)
+        dialog.destroy()
+
+    button_frame = tk.Frame(content_frame, bg=dark_bg, pady=10)
+    button_frame.pack()
+
+    import_button = ttk.Button(button_frame, text="Importa", command=on_submit, style="Accent.TButton")
+    import_button.pack(side="left", padx=5)
+    if not valid_count:
+        import_button.state(["disabled"])
+    ttk.Button(button_frame, text="Annulla", command=dialog.destroy, style="Accent.TButton").pack(side="left", padx=5)
+
+    dialog.transient()
+    dialog.grab_set()
+    dialog.wait_window()
+
+    return bool(confirmed)
+
+def import_favorite(favorites: FavoritesModel, service_pool: 'Future[ServicePool]') -> None:
+    """
+    Import favorites from a Bolder 1 .txt file.
+
+    The file is read one line at a time, the documents are checked with batched requests to
+    Google and a report of every line is shown; the valid favorites are then saved at once.
+    """
     file_path = filedialog.askopenfilename(
         title="Seleziona il file favorites.txt",
         filetypes=[("Text Files", "*.txt")]
@@ -87,29 +324,35 @@ def import_favorite(favorites: Dict[str, str], update_favorites_list: Callable[[
         return
 
     try:
-        with open(file_path, 'r') as file:
-            for line in file:
-                line = line.strip()
-                if '|' in line:
-                    name, document_id = map(str.strip, line.split('|'))
-                    # Convert document_id to full URL
-                    full_url = f"https://docs.google.com/document/d/{document_id}/edit"
-                    favorites[name] = full_url
-            save_favorites(favorites)
-            update_favorites_list()
-            messagebox.showinfo("Successo", "Preferiti importati con successo. Welcome to Bolder 2.0!")
-    except Exception as e:
+        with open(file_path, 'r', encoding='utf-8', errors='replace') as file:
+            entries = list(parse_import_file(file, favorites))
+    except OSError as e:
         messagebox.showerror("Errore", f"Si è verificato un errore durante l'importazione: {e}")
+        return
+    if not entries:
+        messagebox.showerror("Errore", "Il file non contiene preferiti.")
+        return
+
+    validated = import_progress_dialog(service_pool, entries)
+    if validated is None or not import_report_dialog(validated):
+        return
+
+    with bulk_save():
+        for entry in validated:
+            if entry.status == STATUS_OK:
+                favorites[entry.name] = document_url(entry.document_id)
+        save_favorites(favorites)
+    messagebox.showinfo("Successo", "Preferiti importati con successo. Welcome to Bolder 2.0!")
 
-def edit_favorite(favorites: Dict[str, str], favorites_listbox: tk.Listbox, update_favorites_list: Callable[[], None]) -> None:
+def edit_favorite(favorites: FavoritesModel, favorites_view: FavoritesListView) -> None:
     """Edit the name or URL of an existing favorite with a single dialog."""
-    selected = favorites_listbox.curselection()
+    selected = favorites_view.listbox.curselection()
     if not selected:
         messagebox.showerror("Errore", "Seleziona un preferito da modificare.")
         return
 
     # Get the selected favorite's name and URL
-    old_name = favorites_listbox.get(selected)
+    old_name = favorites_view.name_at(selected[0])
     old_url = favorites[old_name]
 
     # Open the dialog with the current name and URL pre-filled
@@ -117,62 +360,9 @@ def edit_favorite(favorites: Dict[str, str], favorites_listbox: tk.Listbox, upda
 
     # Update the favorite if changes are made
     if new_name and new_url:
-        # Preserve the position of the favorite in the list
-        position = list(favorites.keys()).index(old_name)
-
-        # Create a new ordered dictionary with the updated favorite
-        updated_favorites = {}
-        for i, (key, value) in enumerate(favorites.items()):
-            if i == position:
-                updated_favorites[new_name] = new_url  # Insert the updated favorite
-            elif key != old_name:
-                updated_favorites[key] = value  # Keep other favorites unchanged
-
-        # Save the updated favorites and refresh the list
-        favorites.clear()
-        favorites.update(updated_favorites)
+        # Rename in place, preserving the position of the favorite in the list
+        favorites.rename(old_name, new_name, new_url)
         save_favorites(favorites)
-        update_favorites_list()
 
         # Reselect the edited favorite
-        favorites_listbox.selection_clear(0, tk.END)
-        favorites_listbox.selection_set(position)
-        favorites_listbox.activate(position)
-
-def load_favorites() -> Dict[str, str]:
-    """Load favorites from the JSON file."""
-    if os.path.exists(FAVORITES_FILE):
-        with open(FAVORITES_FILE, 'r') as file:
-            return json.load(file)
-    return {}
-
-def save_favorites(favorites: Dict[str, str]) -> None:
-    """Save favorites to the JSON file."""
-    with open(FAVORITES_FILE, 'w') as file:
-        json.dump(favorites, file)
-
-def update_favorites_list(favorites: Dict[str, str], favorites_listbox: tk.Listbox) -> None:
-    """
-    Update the Listbox with the current favorites.
-    
-    Args:
-        favorites (dict): The dictionary of favorites.
-        favorites_listbox (tk.Listbox): The Listbox widget to update.
-    """
-    favorites_listbox.delete(0, "end")
-    for name in favorites:
-        favorites_listbox.insert("end", name)
-
-def save_reordered_favorites(favorites: Dict[str, str], favorites_listbox: tk.Listbox) -> None:
-    """
-    Save the reordered favorites back to the JSON file.
-    
-    Args:
-        favorites (dict): The dictionary of favorites.
-        favorites_listbox (tk.Listbox): The Listbox widget containing the reordered items.
-    """
-    reordered_names = favorites_listbox.get(0, "end")
-    reordered_favorites = {name: favorites[name] for name in reordered_names}
-    favorites.clear()
-    favorites.update(reordered_favorites)
-    save_favorites(favorites)
+        favorites_view.select(new_name)
@@ -0,0 +1,124 @@
+from collections.abc import MutableMapping
+from typing import Dict, List, Iterator, Callable, Optional, Tuple, Any
+
+# A change notified to the listeners: (kind, index, name, extra), where kind is one of
+# 'insert', 'delete', 'rename' (extra is the old name), 'move' (extra is the old index)
+# or 'reset' (the whole list changed)
+Change = Tuple[str, int, str, Any]
+
+class FavoritesModel(MutableMapping):
+    """
+    Ordered store of the favorites (name -> URL) with a name-to-position index.
+
+    It behaves like the ordered dict used before, so it can be passed wherever the favorites
+    were a plain dict, and adds in-place rename, move and delete operations. Listeners are
+    told about each change, so a list widget can be updated incrementally instead of being
+    rebuilt.
+    """
+
+    def __init__(self, favorites: Optional[Dict[str, str]] = None) -> None:
+        self._names: List[str] = []
+        self._urls: Dict[str, str] = {}
+        self._positions: Dict[str, int] = {}
+        self._valid_positions = 0  # Positions below this index are up to date
+        self._listeners: List[Callable[[Change], None]] = []
+        for name, url in (favorites or {}).items():
+            self._urls[name] = url
+            self._names.append(name)
+
+    # Mapping interface, in list order
+
+    def __getitem__(self, name: str) -> str:
+        return self._urls[name]
+
+    def __setitem__(self, name: str, url: str) -> None:
+        if name in self._urls:
+            self._urls[name] = url
+            return
+        self._urls[name] = url
+        self._names.append(name)
+        self._notify(('insert', len(self._names) - 1, name, None))
+
+    def __delitem__(self, name: str) -> None:
+        index = self.index(name)
+        del self._urls[name]
+        del self._positions[name]
+        self._names.pop(index)
+        self._invalidate(index)
+        self._notify(('delete', index, name, None))
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(list(self._names))
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self._urls
+
+    # Positional operations
+
+    def index(self, name: str) -> int:
+        """Return the position of a favorite, raising KeyError if it does not exist."""
+        if name not in self._urls:
+            raise KeyError(name)
+        position = self._positions.get(name)
+        if position is None or position >= self._valid_positions:
+            # Reindex only the tail of the list changed since the last lookup
+            for position in range(self._valid_positions, len(self._names)):
+                self._positions[self._names[position]] = position
+            self._valid_positions = len(self._names)
+        return self._positions[name]
+
+    def name_at(self, index: int) -> str:
+        """Return the name of the favorite at a position."""
+        return self._names[index]
+
+    def rename(self, old_name: str, new_name: str, url: Optional[str] = None) -> None:
+        """Rename a favorite in place, optionally changing its URL, keeping its position."""
+        index = self.index(old_name)
+        if new_name != old_name and new_name in self._urls:
+            # The new name replaces an existing favorite, as it did with the plain dict
+            del self[new_name]
+            index = self.index(old_name)
+        self._urls[new_name] = self._urls.pop(old_name) if url is None else url
+        if new_name != old_name:
+            self._urls.pop(old_name, None)
+            del self._positions[old_name]
+            self._names[index] = new_name
+            self._positions[new_name] = index
+        self._notify(('rename', index, new_name, old_name))
+
+    def move(self, name: str, new_index: int) -> None:
+        """Move a favorite to a new position, shifting the ones in between."""
+        old_index = self.index(name)
+        new_index = max(0, min(new_index, len(self._names) - 1))
+        if new_index == old_index:
+            return
+        self._names.pop(old_index)
+        self._names.insert(new_index, name)
+        self._invalidate(min(old_index, new_index))
+        self._notify(('move', new_index, name, old_index))
+
+    def replace_all(self, favorites: Dict[str, str]) -> None:
+        """Replace all the favorites, keeping the order of the given dict."""
+        self._names = list(favorites)
+        self._urls = dict(favorites)
+        self._positions = {}
+        self._valid_positions = 0
+        self._notify(('reset', 0, '', None))
+
+    # Change notifications
+
+    def subscribe(self, listener: Callable[[Change], None]) -> None:
+        """Register a function called with every change of the favorites."""
+        self._listeners.append(listener)
+
+    def _invalidate(self, index: int) -> None:
+        """Mark the positions from an index onwards as out of date."""
+        self._valid_positions = min(self._valid_positions, index)
+
+    def _notify(self, change: Change) -> None:
+        """Tell the listeners about a change."""
+        for listener in self._listeners:
+            listener(change)
@@ -0,0 +1,122 @@
+import re
+import heapq
+from bisect import bisect_left, insort
+from typing import List, Dict, Set, Tuple, Optional
+from functions.favorites_model import FavoritesModel, Change
+
+# Ranking tiers, best first
+FULL_PREFIX, WORD_PREFIX, SUBSTRING, FUZZY = range(4)
+
+def _tokens(name: str) -> Set[str]:
+    """Return the lowercase words of a name, used for the word-prefix matches."""
+    return set(re.findall(r'\w+', name.lower()))
+
+class FavoritesSearchIndex:
+    """
+    Prefix and fuzzy index over the names of the favorites, kept in sync with the model.
+
+    Whole names and their single words are kept in sorted lists, so prefix matches are found
+    by binary search. Substring and fuzzy (subsequence) matches scan the names with compiled
+    patterns; when the query extends the previous one only the previous results are scanned.
+    """
+
+    def __init__(self, favorites: FavoritesModel) -> None:
+        self.favorites = favorites
+        self._last_query = ''
+        self._last_matches: Optional[List[Tuple[str, str]]] = None  # (lowercase name, name) pairs
+        self._rebuild()
+        favorites.subscribe(self._on_change)
+
+    def _rebuild(self) -> None:
+        """Index all the favorites from scratch."""
+        self._names: List[Tuple[str, str]] = sorted((name.lower(), name) for name in self.favorites)
+        self._words: List[Tuple[str, str]] = sorted((token, name) for name in self.favorites for token in _tokens(name))
+        self._forget_last_query()
+
+    def _add(self, name: str) -> None:
+        insort(self._names, (name.lower(), name))
+        for token in _tokens(name):
+            insort(self._words, (token, name))
+
+    def _remove(self, name: str) -> None:
+        self._names.pop(bisect_left(self._names, (name.lower(), name)))
+        for token in _tokens(name):
+            self._words.pop(bisect_left(self._words, (token, name)))
+
+    def _forget_last_query(self) -> None:
+        self._last_query = ''
+        self._last_matches = None
+
+    def _on_change(self, change: Change) -> None:
+        """Update the index after a change of the model."""
+        kind, _, name, extra = change
+        if kind == 'insert':
+            self._add(name)
+        elif kind == 'delete':
+            self._remove(name)
+        elif kind == 'rename':
+            self._remove(extra)
+            self._add(name)
+        elif kind == 'reset':
+            self._rebuild()
+            return
+        else:
+            return  # Moves do not change the names
+        self._forget_last_query()
+
+    @staticmethod
+    def _prefix_range(items: List[Tuple[str, str]], prefix: str) -> List[str]:
+        """Return the names of the sorted items whose key starts with the prefix."""
+        start = bisect_left(items, (prefix, ''))
+        end = bisect_left(items, (prefix + '\U0010ffff', ''))
+        return [name for _, name in items[start:end]]
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[str]:
+        """
+        Return the names matching the query, best matches first.
+
+        Names starting with the query come first, then names with a word starting with it,
+        then names containing it, then names containing its characters in order. Ties keep
+        the order of the favorites.
+
+        Args:
+            query (str): The text typed by the user; case is ignored.
+            limit (Optional[int]): The maximum number of names to return.
+
+        Returns:
+            List[str]: The matching names.
+        """
+        query = query.strip().lower()
+        if not query:
+            return list(self.favorites)[:limit]
+
+        tiers: Dict[str, int] = {}
+        for name in self._prefix_range(self._names, query):
+            tiers[name] = FULL_PREFIX
+        for name in self._prefix_range(self._words, query):
+            tiers.setdefault(name, WORD_PREFIX)
+
+        # A longer query can only match a subset of the names matched by the shorter one
+        if self._last_matches is not None and query.startswith(self._last_query):
+            candidates = self._last_matches
+        else:
+            candidates = self._names
+        fuzzy = re.compile('.*?'.join(map(re.escape, query))).search
+        matches = []
+        for item in candidates:
+            lowered, name = item
+            if name in tiers:
+                matches.append(item)
+            elif query in lowered:
+                tiers[name] = SUBSTRING
+                matches.append(item)
+            elif fuzzy(lowered):
+                tiers[name] = FUZZY
+                matches.append(item)
+        self._last_query = query
+        self._last_matches = matches
+
+        key = lambda name: (tiers[name], self.favorites.index(name))
+        if limit is not None and limit < len(tiers):
+            return heapq.nsmallest(limit, tiers, key=key)
+        return sorted(tiers, key=key)
@@ -0,0 +1,92 @@
+import os
+import json
+import atexit
+import threading
+from contextlib import contextmanager
+from typing import Dict, Optional, Iterator
+from functions.favorites_model import FavoritesModel
+
+FAVORITES_FILE = "favorites.json"
+SAVE_DELAY = 0.5  # Seconds to wait for further changes before writing the file
+
+_save_lock = threading.RLock()
+_save_timer: Optional[threading.Timer] = None
+_pending_favorites: Optional[Dict[str, str]] = None  # Snapshot waiting to be written
+_last_saved: Optional[str] = None  # Content of the file as last read or written
+_bulk_depth = 0
+
+def load_favorites() -> FavoritesModel:
+    """Load favorites from the JSON file."""
+    global _last_saved
+    if os.path.exists(FAVORITES_FILE):
+        with open(FAVORITES_FILE, 'r') as file:
+            favorites = json.load(file)
+        _last_saved = json.dumps(favorites)
+        return FavoritesModel(favorites)
+    return FavoritesModel()
+
+def save_favorites(favorites: Dict[str, str]) -> None:
+    """
+    Schedule saving favorites to the JSON file.
+
+    The write happens SAVE_DELAY seconds after the last call, so a burst of changes produces a
+    single write; inside `bulk_save` it is postponed to the end of the block. Call
+    `flush_favorites` to write immediately.
+    """
+    global _save_timer, _pending_favorites
+    with _save_lock:
+        _pending_favorites = dict(favorites)
+        if _bulk_depth:
+            return
+        if _save_timer:
+            _save_timer.cancel()
+        _save_timer = threading.Timer(SAVE_DELAY, flush_favorites)
+        _save_timer.daemon = True
+        _save_timer.start()
+
+def flush_favorites() -> None:
+    """Write the pending favorites to the JSON file, if any."""
+    global _save_timer, _pending_favorites
+    with _save_lock:
+        if _save_timer:
+            _save_timer.cancel()
+            _save_timer = None
+        favorites, _pending_favorites = _pending_favorites, None
+        if favorites is not None:
+            _write_favorites(favorites)
+
+def _write_favorites(favorites: Dict[str, str]) -> None:
+    """Write the favorites atomically, skipping the write if the content did not change."""
+    global _last_saved
+    data = json.dumps(favorites)
+    if data == _last_saved:
+        return
+
+    # Write a temporary file and rename it, so a crash never leaves a truncated file
+    temp_file = FAVORITES_FILE + ".tmp"
+    try:
+        with open(temp_file, 'w') as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file, FAVORITES_FILE)
+        _last_saved = data
+    except OSError as e:
+        print(f"Impossibile salvare i preferiti: {e}")
+
+@contextmanager
+def bulk_save() -> Iterator[None]:
+    """Group all the saves made inside the block into a single write at its end."""
+    global _bulk_depth
+    with _save_lock:
+        _bulk_depth += 1
+    try:
+        yield
+    finally:
+        with _save_lock:
+            _bulk_depth -= 1
+            if not _bulk_depth:
+                flush_favorites()
+
+# Write the last changes when the program exits
+atexit.register(flush_favorites)
@@ -1,11 +1,227 @@
-from typing import List, Dict, Any
+import io
+import time
+from typing import List, Dict, Any, Tuple, NamedTuple, Optional, Callable
+from googleapiclient.errors import HttpError
+from functions.matcher import WordMatcher
+from functions.parallel_match import match_paragraphs
+from functions.stream_index import STREAM_MIN_BYTES, streaming_available, stream_text_index
+from functions.text_index import ParagraphIndex, build_text_index
+from functions.request_planner import StyleRanges, plan_batches
+from functions.doc_cache import CachedDocument, DocumentCache, document_cache
+from functions.api_client import execute
+from utils.metrics import run_metrics, profile_if_requested, count
+from functions.undo_history import UndoHistory, UndoError, undo_history, capture_styles, decode_level, inverse_requests
+
+# Called with (phase, current, total) as a formatting run goes on; it may raise to stop the run
+ProgressCallback = Callable[[str, int, int], None]
+
+# Text style fields managed by Bolder, in the order used for the field masks
+STYLE_FIELDS = ('bold', 'italic', 'underline', 'strikethrough')
+
+# Formatting attempts when the document keeps changing between the read and the write
+MAX_ATTEMPTS = 3
+
+# Levels of nested tables and child tabs included in the field mask of documents.get
+MAX_TABLE_DEPTH = 3
+MAX_TAB_DEPTH = 3
+
+def _content_fields(table_depth: int = MAX_TABLE_DEPTH) -> str:
+    """Return the field mask of a list of structural elements: paragraphs and the cells of tables."""
+    fields = f'paragraph(elements(startIndex,endIndex,textRun(content,textStyle({",".join(STYLE_FIELDS)}))))'
+    if table_depth:
+        fields += f',table(tableRows(tableCells(content({_content_fields(table_depth - 1)}))))'
+    return fields
+
+def _tab_fields(tab_depth: int = MAX_TAB_DEPTH) -> str:
+    """Return the field mask of a tab: the text of all its segments and its child tabs."""
+    segments = f'body(content({_content_fields()})),headers,footers,footnotes'
+    fields = f'tabProperties(tabId),documentTab({segments})'
+    if tab_depth:
+        fields += f',childTabs({_tab_fields(tab_depth - 1)})'
+    return fields
+
+# Field mask of documents.get: only the paragraphs of every tab and segment, with their
+# indexes, text and text style. Headers, footers and footnotes are maps, which cannot be
+# projected, so they come whole; they are small compared to the body.
+DOCUMENT_FIELDS = f'documentId,revisionId,tabs({_tab_fields()})'
+
+class FetchStats(NamedTuple):
+    """Statistics of a documents.get call."""
+    payload_bytes: int  # The size of the response body
+    parse_seconds: float  # The time spent parsing the JSON response and building the text index
+    total_seconds: float  # The total time of the call, including the download
+    streamed: bool  # Whether the response was indexed while parsed, without building the document tree
+
+def fetch_document(service: Any, document_id: str) -> Tuple[CachedDocument, FetchStats]:
+    """
+    Fetch the parts of the document needed to match and format words, and index their text.
+
+    Large responses are indexed while they are parsed, when the optional ijson package is
+    installed: the decoded document can take many times the size of the JSON, while the
+    index only keeps the text runs and their offsets. Smaller responses, or all of them
+    without ijson, are decoded whole and indexed right away, so the tree is released before
+    this function returns.
+
+    Args:
+        service (Any): The Google Docs API service object.
+        document_id (str): The ID of the Google Document.
+
+    Returns:
+        Tuple[CachedDocument, FetchStats]: The text index of the document and the statistics of the call.
+    """
+    request = service.documents().get(documentId=document_id, fields=DOCUMENT_FIELDS, includeTabsContent=True)
+    measured = {'payload_bytes': 0, 'parse_seconds': 0.0, 'streamed': False}
+
+    # Replace the response parser: index the response, measuring the payload and the time spent
+    postproc = request.postproc
+    def indexing_postproc(response: Any, content: bytes) -> CachedDocument:
+        started = time.perf_counter()
+        if streaming_available() and len(content) >= STREAM_MIN_BYTES:
+            revision_id, paragraphs = stream_text_index(io.BytesIO(content))
+            measured['streamed'] = True
+        else:
+            doc = postproc(response, content)
+            revision_id, paragraphs = doc.get('revisionId'), build_text_index(doc)
+        measured['parse_seconds'] = time.perf_counter() - started
+        measured['payload_bytes'] = len(content)
+        return CachedDocument(revision_id, paragraphs)
+    request.postproc = indexing_postproc
+
+    started = time.perf_counter()
+    entry = execute(request)
+    return entry, FetchStats(measured['payload_bytes'], measured['parse_seconds'], time.perf_counter() - started, measured['streamed'])
+
+def fetch_revision_id(service: Any, document_id: str) -> Optional[str]:
+    """Fetch only the current revisionId of the document, to validate a cached copy."""
+    return execute(service.documents().get(documentId=document_id, fields='revisionId')).get('revisionId')
+
+def load_document(service: Any, document_id: str, cache: DocumentCache = document_cache) -> CachedDocument:
+    """
+    Return the text index of the document, reusing the cached one if it is still current.
+
+    Args:
+        service (Any): The Google Docs API service object.
+        document_id (str): The ID of the Google Document.
+        cache (DocumentCache): The cache of the text indexes.
+
+    Returns:
+        CachedDocument: The text index of the document and its revision.
+    """
+    if cache.get(document_id) is not None:
+        entry = cache.get(document_id, fetch_revision_id(service, document_id))
+        if entry is not None:
+            count('cache_hits')
+            return entry
+
+    entry, fetch_stats = fetch_document(service, document_id)
+    count('document_bytes', fetch_stats.payload_bytes)
+    count('parse_seconds', fetch_stats.parse_seconds)
+    count('streamed_documents', int(fetch_stats.streamed))
+
+    cache.put(document_id, entry)
+    return entry
+
+def find_style_updates(
+    paragraphs: List[ParagraphIndex],  # The text index of the document
+    matcher: WordMatcher,  # The matcher of the words to format
+    text_style: Dict[str, bool],  # The text style to apply
+    diff: bool = True  # Whether to only keep the styles that would actually change
+) -> Tuple[StyleRanges, int]:
+    """
+    Find the ranges to update, grouped by their segment and the field mask to send for them.
+
+    Args:
+        paragraphs (List[ParagraphIndex]): The text index of the document.
+        matcher (WordMatcher): The matcher of the words to format.
+        text_style (Dict[str, bool]): The text style to apply, with all the STYLE_FIELDS.
+        diff (bool): Whether to only keep the selected options on the ranges where they differ
+            from the current text style.
+
+    Returns:
+        Tuple[StyleRanges, int]: The Docs ranges grouped by (segment, field mask) and the number
+        of matches that will change.
+    """
+    selected_fields = [field for field in STYLE_FIELDS if text_style[field]] if diff else list(STYLE_FIELDS)
+    ranges_by_fields: StyleRanges = {}
+    changes_count = 0  # Counter for the number of changes made
+
+    # Scan each paragraph once, so matches can span text runs
+    matches = match_paragraphs(matcher, [paragraph.text for paragraph in paragraphs])
+    for paragraph, paragraph_matches in zip(paragraphs, matches):
+        for start_offset, end_offset in paragraph_matches:
+            if not diff:
+                ranges_by_fields.setdefault((paragraph.segment, ','.join(selected_fields)), []).append(paragraph.to_document_range(start_offset, end_offset))
+                changes_count += 1
+                continue
+
+            # Only keep the pieces of the match whose style would actually change
+            changed = False
+            for start_index, end_index, current_style in paragraph.split_range(start_offset, end_offset):
+                if current_style is None:
+                    continue
+                fields = ','.join(field for field in selected_fields if current_style.get(field, False) != text_style[field])
+                if fields:
+                    ranges_by_fields.setdefault((paragraph.segment, fields), []).append((start_index, end_index))
+                    changed = True
+            if changed:
+                changes_count += 1
+
+    return ranges_by_fields, changes_count
+
+def send_batches(
+    service: Any,  # The Google Docs API service object
+    document_id: str,  # The ID of the Google Document
+    revision_id: Optional[str],  # The revision the requests were computed on
+    batches: List[List[Dict[str, Any]]],  # The requests of each batchUpdate call
+    cache: DocumentCache = document_cache,  # The cache to keep in sync with the document
+    on_progress: Optional[ProgressCallback] = None,  # Called before each batch with ('send', number, total)
+    on_sent: Optional[Callable[[Optional[str]], None]] = None,  # Called with the new revision after each batch
+    merge_edits: bool = False  # Whether to let the server merge the edits made by others since `revision_id`
+) -> None:
+    """
+    Send the batches, each one bound to the revision left by the previous one.
+
+    The requiredRevisionId write control makes a batch fail instead of formatting the wrong
+    text if someone else edited the document in the meantime, and lets the cache follow our
+    own updates without downloading the document again. If `on_progress` raises, the run
+    stops between two batches, leaving the cache in sync with the batches already sent.
+
+    With `merge_edits`, every batch targets `revision_id` instead (targetRevisionId): the
+    server moves the ranges over the edits made since, so a busy document can be formatted
+    without a clean window between read and write. The document then holds text the cache
+    never saw, so its entry is dropped rather than updated.
+    """
+    for number, batch in enumerate(batches, start=1):
+        if on_progress:
+            on_progress('send', number, len(batches))
+        body = {'requests': batch}
+        if revision_id:
+            body['writeControl'] = {'targetRevisionId' if merge_edits else 'requiredRevisionId': revision_id}
+        response = execute(service.documents().batchUpdate(documentId=document_id, body=body))
+        new_revision_id = (response or {}).get('writeControl', {}).get('requiredRevisionId')
+        if merge_edits:
+            cache.invalidate(document_id)
+        else:
+            cache.apply_updates(document_id, revision_id, new_revision_id, batch)
+            revision_id = new_revision_id
+        if on_sent:
+            on_sent(new_revision_id)
+
+def is_stale_revision(service: Any, document_id: str, error: HttpError, revision_id: Optional[str]) -> bool:
+    """Tell whether a failed batchUpdate was rejected because the document moved past `revision_id`."""
+    return error.resp.status == 400 and fetch_revision_id(service, document_id) != revision_id
 
 def toggle_formatting(
     service: Any,  # The Google Docs API service object
     document_id: str,  # The ID of the Google Document
     words: List[str],  # A list of words to format
     formatting_options: Dict[str, bool],  # Formatting options (e.g., {'bold': True, 'italic': False})
-    ignore_case: bool = False  # Whether to ignore case when matching words
+    ignore_case: bool = False,  # Whether to ignore case when matching words
+    diff: bool = True,  # Whether to only send the styles that would actually change
+    on_progress: Optional[ProgressCallback] = None,  # Called at each phase: 'fetch', 'match', then 'send' per batch
+    paragraph_filter: Optional[Callable[[ParagraphIndex], bool]] = None,  # Only scan the paragraphs it accepts
+    merge_edits: bool = False,  # Whether to let the server merge the edits made by others meanwhile
+    on_fetched: Optional[Callable[[CachedDocument], None]] = None  # Called with the copy each attempt is computed on
 ) -> int:
     """
     Apply multiple formatting options (bold, italic, underline, strikethrough) to the specified words in the Google Document.
@@ -16,68 +232,114 @@ def toggle_formatting(
         words (List[str]): A list of words to format.
         formatting_options (Dict[str, bool]): A dictionary specifying formatting options (e.g., {'bold': True, 'italic': False}).
         ignore_case (bool): Whether to ignore case when matching words.
+        diff (bool): Whether to only update the selected options on the ranges where they differ
+            from the current text style. When False, all four options are written on every match,
+            clearing the ones that are not selected.
+        on_progress (Optional[ProgressCallback]): Called with (phase, current, total) when the
+            document is downloaded, searched and before each batch is sent. An exception raised
+            by it stops the run at that point.
+        paragraph_filter (Optional[Callable[[ParagraphIndex], bool]]): When given, only the
+            paragraphs for which it returns True are searched, e.g. the ones changed since
+            the last run.
+        merge_edits (bool): Whether to send the batches against the revision they were
+            computed on and let the server merge the edits made since (see `send_batches`),
+            instead of failing when someone types in the meantime. Such runs are not
+            recorded for undo: their ranges may have moved by the time they are applied.
+        on_fetched (Optional[Callable[[CachedDocument], None]]): Called with the text index
+            and revision of the document as read by each attempt, before it is searched.
 
     Returns:
-        int: The number of changes made to the document.
+        int: The number of matches whose formatting was changed.
     """
-    doc = service.documents().get(documentId=document_id).execute()
-    requests = []
-    changes_count = 0  # Counter for the number of changes made
+    # Build the matcher once, then scan each paragraph a single time for all the words
+    matcher = WordMatcher(words, ignore_case)
+
+    # Create the text_style dictionary with all formatting options
+    text_style = {field: formatting_options.get(field, False) for field in STYLE_FIELDS}
+
+    with profile_if_requested(), run_metrics('toggle_formatting', document_id=document_id, words=len(matcher.words), diff=diff) as metrics:
+        for attempt in range(MAX_ATTEMPTS):
+            if on_progress:
+                on_progress('fetch', 0, 0)
+            with metrics.span('fetch'):
+                entry = load_document(service, document_id)
+            if on_fetched:
+                on_fetched(entry)
+            if on_progress:
+                on_progress('match', 0, 0)
+            with metrics.span('match'):
+                paragraphs = [paragraph for paragraph in entry.paragraphs if paragraph_filter(paragraph)] if paragraph_filter else entry.paragraphs
+                ranges_by_fields, changes_count = find_style_updates(paragraphs, matcher, text_style, diff)
+                metrics.add('scanned_paragraphs', len(paragraphs))
+
+            # Merge the ranges and send them in batches that stay within the API limits
+            with metrics.span('plan'):
+                plan = plan_batches(ranges_by_fields, text_style)
+
+                # Remember the original style of the ranges about to change, so the run can be undone
+                original_styles = capture_styles(entry.paragraphs, plan.batches)
+                changed_fields = [field for field in STYLE_FIELDS if any(field in fields.split(',') for _, fields in ranges_by_fields)]
+            sent_revisions = []
+            try:
+                with metrics.span('send'):
+                    send_batches(service, document_id, entry.revision_id, plan.batches, on_progress=on_progress, on_sent=sent_revisions.append, merge_edits=merge_edits)
+                break
+            except HttpError as error:
+                # Only a document changed after it was read is worth a retry, on a fresh copy
+                document_cache.invalidate(document_id)
+                expected_revision_id = sent_revisions[-1] if sent_revisions else entry.revision_id
+                if attempt == MAX_ATTEMPTS - 1 or not is_stale_revision(service, document_id, error, expected_revision_id):
+                    raise
+                metrics.add('stale_revisions')
+            finally:
+                # Also record a run stopped halfway: restoring the ranges not sent yet is harmless
+                if sent_revisions and not merge_edits:
+                    undo_history.record(document_id, entry.revision_id, sent_revisions[-1], changed_fields, original_styles)
+
+        metrics.add('changes', changes_count)
+        metrics.add('requests', plan.requests_count)
+        metrics.add('saved_requests', plan.saved_requests)
+        metrics.add('batches', len(plan.batches))
+        metrics.add('payload_bytes', plan.payload_bytes)
+
+    return changes_count  # Return the number of changes made
+
+def undo_formatting(
+    service: Any,  # The Google Docs API service object
+    document_id: str,  # The ID of the Google Document
+    history: UndoHistory = undo_history,  # The recorded formatting runs
+    cache: DocumentCache = document_cache  # The cache to keep in sync with the document
+) -> int:
+    """
+    Restore the styles changed by the last formatting run of the document.
+
+    All the original styles are restored by a single batchUpdate, bound to the revision the
+    run left the document at: if the document was edited since, nothing is changed and the
+    history of the document is dropped, since its ranges no longer match the text.
+
+    Returns:
+        int: The number of ranges restored.
+
+    Raises:
+        UndoError: If there is nothing to undo or the document was edited after the run.
+    """
+    with run_metrics('undo_formatting', document_id=document_id) as metrics:
+        level = history.peek(document_id)
+        if level is None:
+            raise UndoError("Nessuna formattazione da annullare per questo documento.")
+
+        requests = inverse_requests(decode_level(level), level['fields'])
+        body = {'requests': requests, 'writeControl': {'requiredRevisionId': level['after']}}
+        try:
+            response = execute(service.documents().batchUpdate(documentId=document_id, body=body))
+        except HttpError as error:
+            if is_stale_revision(service, document_id, error, level['after']):
+                history.discard(document_id)
+                raise UndoError("Il documento è stato modificato dopo l'ultima formattazione: impossibile annullarla.") from error
+            raise
 
-    # Normalize words for case-insensitive matching
-    normalized_words = [word.lower() if ignore_case else word for word in words]
-
-    # Iterate through the document's content
-    for element in doc['body']['content']:
-        if 'paragraph' in element:
-            for paragraph_element in element['paragraph']['elements']:
-                if 'textRun' in paragraph_element and 'content' in paragraph_element['textRun']:
-                    text = paragraph_element['textRun']['content']
-                    normalized_text = text.lower() if ignore_case else text
-
-                    for word, normalized_word in zip(words, normalized_words):
-                        start_index = 0
-                        while True:
-                            # Find the word in the text
-                            start_index = normalized_text.find(normalized_word, start_index)
-                            if start_index == -1:
-                                break
-
-                            # Ensure it's a whole word match
-                            before = start_index - 1
-                            after = start_index + len(normalized_word)
-                            if (before >= 0 and normalized_text[before].isalnum()) or \
-                               (after < len(normalized_text) and normalized_text[after].isalnum()):
-                                start_index += len(normalized_word)
-                                continue
-
-                            # Add the request to apply formatting
-                            end_index = start_index + len(normalized_word)
-
-                            # Create the text_style dictionary with all formatting options
-                            text_style = {
-                                'bold': formatting_options.get('bold', False),
-                                'italic': formatting_options.get('italic', False),
-                                'underline': formatting_options.get('underline', False),
-                                'strikethrough': formatting_options.get('strikethrough', False)
-                            }
-                            fields = 'bold,italic,underline,strikethrough'
-
-                            requests.append({
-                                'updateTextStyle': {
-                                    'range': {
-                                        'startIndex': paragraph_element['startIndex'] + start_index,
-                                        'endIndex': paragraph_element['startIndex'] + end_index
-                                    },
-                                    'textStyle': text_style,
-                                    'fields': fields
-                                }
-                            })
-                            changes_count += 1  # Increment the counter
-                            start_index = end_index
-
-    # Execute the batch update request
-    if requests:
-        service.documents().batchUpdate(documentId=document_id, body={'requests': requests}).execute()
-
-    return changes_count  # Return the number of changes made
\ No newline at end of file
+        revision_id = (response or {}).get('writeControl', {}).get('requiredRevisionId')
+        cache.apply_updates(document_id, level['after'], revision_id, requests)
+        history.pop(document_id, revision_id)
+        metrics.add('requests', len(requests))
+        return len(requests)
@@ -0,0 +1,146 @@
+import time
+import random
+from typing import List, Dict, Any, Iterator, Iterable, Callable, NamedTuple, Optional, Tuple
+from googleapiclient.errors import HttpError
+from functions.api_client import execute, read_limiter, api_stats, RETRYABLE_STATUSES, MAX_RETRIES, INITIAL_BACKOFF
+
+# Number of metadata lookups sent in a single batch HTTP request
+VALIDATION_BATCH_SIZE = 50
+
+# Statuses of an imported line
+STATUS_OK = "ok"
+STATUS_INVALID = "riga non valida"
+STATUS_DUPLICATE = "duplicato"
+STATUS_EXISTING = "già presente"
+STATUS_NOT_FOUND = "documento non trovato"
+STATUS_FORBIDDEN = "accesso negato"
+
+class ImportEntry(NamedTuple):
+    """A line of a Bolder 1 favorites file and the outcome of its validation."""
+    line_number: int  # The line of the file, starting from 1
+    name: str  # The name of the favorite
+    document_id: str  # The ID of the Google Document
+    status: str  # One of the STATUS_* values, or an error message
+    title: str = ""  # The title of the document, once validated
+
+def document_url(document_id: str) -> str:
+    """Convert a document ID to the full URL stored in the favorites."""
+    return f"https://docs.google.com/document/d/{document_id}/edit"
+
+def parse_import_file(lines: Iterable[str], favorites: Dict[str, str]) -> Iterator[ImportEntry]:
+    """
+    Parse a Bolder 1 favorites file ("name | document_id" per line) one line at a time.
+
+    Lines with a name already seen earlier in the file are reported as duplicates, and
+    favorites already saved with the same URL as already present; neither will be validated.
+
+    Args:
+        lines (Iterable[str]): The lines of the file, e.g. the open file itself.
+        favorites (Dict[str, str]): The current favorites.
+
+    Yields:
+        ImportEntry: One entry per non-empty line, in file order.
+    """
+    seen_names = set()
+    for line_number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        parts = [part.strip() for part in line.split('|')]
+        if len(parts) != 2 or not all(parts):
+            yield ImportEntry(line_number, line, "", STATUS_INVALID)
+            continue
+
+        name, document_id = parts
+        if name in seen_names:
+            status = STATUS_DUPLICATE
+        elif favorites.get(name) == document_url(document_id):
+            status = STATUS_EXISTING
+        else:
+            status = STATUS_OK
+        seen_names.add(name)
+        yield ImportEntry(line_number, name, document_id, status)
+
+def _lookup_error(error: Exception) -> Tuple[str, bool]:
+    """Return the status of a failed lookup and whether it is worth retrying."""
+    status = getattr(getattr(error, 'resp', None), 'status', None)
+    if status == 404:
+        return STATUS_NOT_FOUND, False
+    if status in (401, 403):
+        return STATUS_FORBIDDEN, False
+    return f"errore: {error}", status in RETRYABLE_STATUSES
+
+def validate_documents(
+    service: Any,  # The Google Docs API service object
+    document_ids: List[str],  # The IDs to check
+    on_progress: Optional[Callable[[int, int], None]] = None  # Called with (checked, total) after each batch
+) -> Dict[str, Tuple[str, str]]:
+    """
+    Check that the documents exist and are accessible, many per round trip.
+
+    The lookups ask only for the document title and are grouped in batch HTTP requests of
+    VALIDATION_BATCH_SIZE. Lookups failing with a quota or server error are sent again in
+    a later batch, with backoff.
+
+    Returns:
+        Dict[str, Tuple[str, str]]: For each ID, its status and the title of the document.
+    """
+    unique_ids = list(dict.fromkeys(document_ids))
+    results: Dict[str, Tuple[str, str]] = {}
+    pending = unique_ids
+    backoff = INITIAL_BACKOFF
+
+    for attempt in range(MAX_RETRIES + 1):
+        retry = []
+        for start in range(0, len(pending), VALIDATION_BATCH_SIZE):
+            chunk = pending[start:start + VALIDATION_BATCH_SIZE]
+
+            def callback(request_id: str, response: Any, exception: Exception) -> None:
+                if exception is None:
+                    results[request_id] = (STATUS_OK, response.get('title', ''))
+                    return
+                status, retryable = _lookup_error(exception)
+                if retryable and attempt < MAX_RETRIES:
+                    retry.append(request_id)
+                else:
+                    results[request_id] = (status, '')
+
+            batch = service.new_batch_http_request(callback=callback)
+            for document_id in chunk:
+                batch.add(service.documents().get(documentId=document_id, fields='title'), request_id=document_id)
+
+            # Every lookup of the batch counts against the read quota; `execute` takes the last token
+            for _ in range(len(chunk) - 1):
+                read_limiter.acquire()
+                api_stats.record_call('read')
+            execute(batch)
+
+            if on_progress:
+                on_progress(len(results), len(unique_ids))
+
+        if not retry:
+            break
+        pending = retry
+        time.sleep(random.uniform(0, backoff))
+        backoff *= 2
+
+    return results
+
+def validate_entries(
+    service: Any,  # The Google Docs API service object
+    entries: List[ImportEntry],  # The parsed lines
+    on_progress: Optional[Callable[[int, int], None]] = None  # Called with (checked, total) after each batch
+) -> List[ImportEntry]:
+    """Validate the documents of the importable entries and return the entries with their final status."""
+    to_check = [entry.document_id for entry in entries if entry.status == STATUS_OK]
+    try:
+        results = validate_documents(service, to_check, on_progress)
+    except HttpError as error:
+        # The whole batch failed: report it on every entry instead of losing the import
+        status, _ = _lookup_error(error)
+        results = {document_id: (status, '') for document_id in to_check}
+
+    return [
+        entry._replace(status=results[entry.document_id][0], title=results[entry.document_id][1]) if entry.status == STATUS_OK else entry
+        for entry in entries
+    ]
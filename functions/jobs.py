@@ -0,0 +1,78 @@
+import queue
+import threading
+from typing import Any, Callable, NamedTuple, Optional
+
+class JobCancelled(Exception):
+    """Raised inside a job when the user asked to stop it."""
+
+class JobEvent(NamedTuple):
+    """A message sent by a job to the thread that started it."""
+    kind: str  # 'progress', 'done', 'error' or 'cancelled'
+    phase: str = ""  # For progress events: 'fetch', 'match', 'send' or 'document'
+    current: int = 0  # For progress events: the step being run
+    total: int = 0  # For progress events: the number of steps, 0 if unknown
+    value: Any = None  # For 'done' the result of the job, for 'error' the exception, optional for progress
+
+class Job:
+    """
+    Runs a function in a worker thread, passing events back through a thread-safe queue.
+
+    The worker never touches the widgets: the Tk main thread reads the events with `poll`,
+    typically from a `root.after` loop. The function receives the job itself, and calls
+    `report` to send progress; once `cancel` has been called, the next `report` or
+    `check_cancelled` raises JobCancelled, so the work stops at the next safe point.
+    """
+
+    def __init__(self, function: Callable[['Job'], Any]) -> None:
+        self.function = function
+        self.events: queue.Queue = queue.Queue()
+        self._cancelled = threading.Event()
+
+    def start(self) -> 'Job':
+        """Start the job in a daemon thread."""
+        threading.Thread(target=self._run, daemon=True).start()
+        return self
+
+    def _run(self) -> None:
+        try:
+            result = self.function(self)
+        except JobCancelled:
+            self.events.put(JobEvent('cancelled'))
+        except Exception as error:
+            self.events.put(JobEvent('error', value=error))
+        else:
+            self.events.put(JobEvent('done', value=result))
+
+    def cancel(self) -> None:
+        """Ask the job to stop at the next progress report. Safe to call from any thread."""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def check_cancelled(self) -> None:
+        """Raise JobCancelled if the job was cancelled. Called from the worker thread."""
+        if self._cancelled.is_set():
+            raise JobCancelled("Operazione annullata")
+
+    def report(self, phase: str, current: int = 0, total: int = 0) -> None:
+        """Send a progress event, stopping the job if it was cancelled. Called from the worker thread."""
+        self.check_cancelled()
+        self.notify(phase, current, total)
+
+    def notify(self, phase: str, current: int = 0, total: int = 0, value: Any = None) -> None:
+        """Send a progress event without checking for cancellation. Safe to call from any thread."""
+        self.events.put(JobEvent('progress', phase, current, total, value))
+
+    def wait(self, seconds: float) -> None:
+        """Sleep in the worker thread, waking up and stopping the job as soon as it is cancelled."""
+        if self._cancelled.wait(seconds):
+            raise JobCancelled("Operazione annullata")
+
+    def poll(self) -> Optional[JobEvent]:
+        """Return the next event without waiting, or None if there is none yet."""
+        try:
+            return self.events.get_nowait()
+        except queue.Empty:
+            return None
@@ -0,0 +1,108 @@
+import tkinter as tk
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+from utils.styles import dark_bg, dark_fg
+from functions.matcher import WordMatcher
+from functions.doc_cache import CachedDocument, document_cache
+from functions.google_docs import load_document
+from functions.service_pool import ServicePool
+from functions.jobs import Job
+
+# Delay between the last keystroke and the recount of the matches
+PREVIEW_DELAY_MS = 300
+
+class MatchPreviewPanel:
+    """
+    Shows how many times each word would be matched in the selected document.
+
+    The text index of the document is loaded once in the background (from the document cache
+    when possible) and kept as a local snapshot; every recount then runs on the snapshot with
+    no network call. Occurrences of different words are independent, so the count of each
+    word is kept and only words typed since the last recount are scanned.
+    """
+
+    def __init__(self, parent: tk.Widget, service_pool: 'Future[ServicePool]') -> None:
+        self.service_pool = service_pool
+        self.frame = tk.Frame(parent, bg=dark_bg)
+        tk.Label(self.frame, text="Anteprima corrispondenze:", bg=dark_bg, fg=dark_fg).pack(anchor="w")
+        self.text = tk.Text(self.frame, height=5, width=40, bg=dark_bg, fg=dark_fg, state="disabled")
+        self.text.pack()
+        self.text.tag_configure("missing", foreground="red")
+
+        self.document_id: Optional[str] = None
+        self.snapshot: Optional[CachedDocument] = None
+        self.words: List[str] = []
+        self.ignore_case = False
+        self._counts: Dict[Tuple[str, bool], int] = {}  # (normalized word, ignore_case) -> count
+        self._pending_refresh: Optional[str] = None
+
+    def set_document(self, document_id: str) -> None:
+        """Take a snapshot of a document, loading it in the background if it is not cached."""
+        if document_id == self.document_id:
+            return
+        self.document_id = document_id
+        self.snapshot = None
+        self._counts = {}
+
+        cached = document_cache.get(document_id)
+        if cached is not None:
+            self.snapshot = cached
+            self._refresh()
+            return
+
+        self._show([("Caricamento del documento...", None)])
+        def load(job: Job) -> CachedDocument:
+            with self.service_pool.result().lease() as service:
+                return load_document(service, document_id)
+        self._poll(Job(load).start(), document_id)
+
+    def _poll(self, job: Job, document_id: str) -> None:
+        """Wait for the snapshot on the Tk main thread."""
+        event = job.poll()
+        if event is None:
+            self.frame.after(100, self._poll, job, document_id)
+            return
+        if document_id != self.document_id:
+            return  # Another document was selected in the meantime
+        if event.kind == 'done':
+            self.snapshot = event.value
+            self._refresh()
+        else:
+            self._show([(f"Anteprima non disponibile: {event.value}", None)])
+
+    def set_words(self, words: List[str], ignore_case: bool) -> None:
+        """Schedule a recount with new words, waiting for the user to stop typing."""
+        self.words = words
+        self.ignore_case = ignore_case
+        if self._pending_refresh:
+            self.frame.after_cancel(self._pending_refresh)
+        self._pending_refresh = self.frame.after(PREVIEW_DELAY_MS, self._refresh)
+
+    def _refresh(self) -> None:
+        """Count the matches of each word in the snapshot and show them."""
+        self._pending_refresh = None
+        if self.snapshot is None:
+            return
+
+        matcher = WordMatcher(self.words, self.ignore_case)
+        new_words = [word for word in matcher.words if (word, self.ignore_case) not in self._counts]
+        if new_words:
+            # The new words are already normalized, so the flag only affects the scanned text
+            counts = WordMatcher(new_words, self.ignore_case).count_words(paragraph.text for paragraph in self.snapshot.paragraphs)
+            for word, count in counts.items():
+                self._counts[(word, self.ignore_case)] = count
+
+        self._show([(word, self._counts[(word, self.ignore_case)]) for word in matcher.words])
+
+    def _show(self, rows: List[Tuple[str, Optional[int]]]) -> None:
+        """Replace the content of the panel, highlighting the words without matches."""
+        self.text.configure(state="normal")
+        self.text.delete("1.0", tk.END)
+        for word, count in rows:
+            if count is None:
+                self.text.insert(tk.END, word + "\n")
+            else:
+                # Words are matched as typed, so surrounding spaces are shown too
+                label = word if word == word.strip() else f'"{word}"'
+                self.text.insert(tk.END, f"{label}: {count}\n", ("missing",) if count == 0 else ())
+        self.text.configure(state="disabled")
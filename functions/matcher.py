@@ -0,0 +1,126 @@
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+def _normalize_words(words: List[str], ignore_case: bool) -> List[str]:
+    """Return the normalized words without empty strings or duplicates, keeping their order."""
+    normalized_words = []
+    seen = set()
+    for word in words:
+        normalized_word = word.lower() if ignore_case else word
+        if normalized_word and normalized_word not in seen:
+            seen.add(normalized_word)
+            normalized_words.append(normalized_word)
+    return normalized_words
+
+def _is_whole_word(normalized_text: str, start: int, end: int) -> bool:
+    """Check that the match is not preceded or followed by an alphanumeric character."""
+    if start > 0 and normalized_text[start - 1].isalnum():
+        return False
+    if end < len(normalized_text) and normalized_text[end].isalnum():
+        return False
+    return True
+
+class WordMatcher:
+    """
+    Aho-Corasick automaton that finds every word of a list in a single scan of the text.
+
+    The matches follow the same rules as the original `str.find` loop of `toggle_formatting`:
+    occurrences of the same word never overlap (the scan resumes after each occurrence, even
+    when it is rejected), and only whole-word occurrences are returned.
+    """
+
+    def __init__(self, words: List[str], ignore_case: bool = False) -> None:
+        """
+        Build the automaton for the given words.
+
+        Args:
+            words (List[str]): The words to search for. Empty and duplicate words are ignored.
+            ignore_case (bool): Whether to ignore case when matching words.
+        """
+        self.ignore_case = ignore_case
+        self.words = _normalize_words(words, ignore_case)
+
+        # State 0 is the root; each state has its transitions, fail link and matched word indices
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for word_index, word in enumerate(self.words):
+            state = 0
+            for char in word:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                    self._goto[state][char] = next_state
+                state = next_state
+            self._output[state].append(word_index)
+
+        # Breadth-first construction of the fail links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                self._fail[next_state] = self._goto[fallback].get(char, 0)
+                # Inherit the words that end on the fail state, shortest last
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def _scan(self, text: str) -> Iterator[Tuple[int, int, int]]:
+        """Yield the (start, end, word index) of each whole-word occurrence, by end position."""
+        normalized_text = text.lower() if self.ignore_case else text
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        lengths = [len(word) for word in self.words]
+        last_end = [0] * len(self.words)  # End of the last occurrence of each word
+
+        state = 0
+        for position, char in enumerate(normalized_text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            for word_index in output[state]:
+                end = position + 1
+                start = end - lengths[word_index]
+                if start < last_end[word_index]:
+                    continue  # Overlaps the previous occurrence of the same word
+                last_end[word_index] = end
+                if _is_whole_word(normalized_text, start, end):
+                    yield start, end, word_index
+
+    def find_ranges(self, text: str) -> List[Tuple[int, int]]:
+        """
+        Find all the whole-word occurrences of the words in the text.
+
+        Args:
+            text (str): The text to scan.
+
+        Returns:
+            List[Tuple[int, int]]: The (start, end) offsets of the matches, sorted by position.
+        """
+        if not self.words:
+            return []
+        return sorted((start, end) for start, end, _ in self._scan(text))
+
+    def count_words(self, texts: Iterable[str]) -> Dict[str, int]:
+        """
+        Count the occurrences of each word in several texts, scanned separately.
+
+        Args:
+            texts (Iterable[str]): The texts to scan, e.g. the paragraphs of a document.
+
+        Returns:
+            Dict[str, int]: The number of matches of each normalized word, including zeros.
+        """
+        counts = [0] * len(self.words)
+        if self.words:
+            for text in texts:
+                for _, _, word_index in self._scan(text):
+                    counts[word_index] += 1
+        return dict(zip(self.words, counts))
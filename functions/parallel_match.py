@@ -0,0 +1,100 @@
+import os
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional, Tuple
+from functions.matcher import WordMatcher
+from utils.metrics import count
+
+# Documents with less text than this are matched in the calling thread: below it, starting
+# the worker processes and sending them the text costs more than the scan itself
+PARALLEL_MIN_CHARS = 2_000_000
+
+# Worker processes of the pool; matching is pure CPU work, so one per core at most
+MAX_PROCESSES = min(4, os.cpu_count() or 1)
+
+# Pieces the paragraphs are split into for each process, so a piece of long paragraphs does not leave the others idle
+CHUNKS_PER_PROCESS = 4
+
+# Matches of each paragraph, in the order of the paragraphs
+ParagraphMatches = List[List[Tuple[int, int]]]
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+# Matcher of the last word list seen by a worker process, rebuilt only when the words change
+_worker_key: Optional[Tuple[Tuple[str, ...], bool]] = None
+_worker_matcher: Optional[WordMatcher] = None
+
+def _match_chunk(words: Tuple[str, ...], ignore_case: bool, texts: List[str]) -> ParagraphMatches:
+    """Match a piece of the paragraphs; runs in a worker process."""
+    global _worker_key, _worker_matcher
+    if _worker_key != (words, ignore_case):
+        _worker_matcher = WordMatcher(list(words), ignore_case)
+        _worker_key = (words, ignore_case)
+    return [_worker_matcher.find_ranges(text) for text in texts]
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Return the shared process pool, starting it on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # Spawned rather than forked: the application has threads (Tk, HTTP sessions)
+            # that a fork would copy in an inconsistent state, and Windows can only spawn
+            _pool = ProcessPoolExecutor(max_workers=MAX_PROCESSES, mp_context=multiprocessing.get_context('spawn'))
+        return _pool
+
+def _reset_pool() -> None:
+    """Drop a broken pool, so the next parallel match starts a new one."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False)
+            _pool = None
+
+def split_chunks(texts: List[str], chunk_count: int) -> List[List[str]]:
+    """Split the texts into at most `chunk_count` consecutive pieces of similar total length."""
+    target = max(1, sum(len(text) for text in texts) // max(1, chunk_count))
+    chunks: List[List[str]] = [[]]
+    size = 0
+    for text in texts:
+        if size >= target:
+            chunks.append([])
+            size = 0
+        chunks[-1].append(text)
+        size += len(text)
+    return chunks
+
+def match_paragraphs(matcher: WordMatcher, texts: List[str], min_chars: int = PARALLEL_MIN_CHARS) -> ParagraphMatches:
+    """
+    Find the matches of each paragraph, on several processes for very large documents.
+
+    Paragraphs are matched independently of each other, so splitting them into pieces of
+    consecutive paragraphs and concatenating the results of the pieces in order gives
+    exactly the result of the serial scan. Should the pool fail (e.g. a worker killed by the
+    system), the paragraphs are matched serially instead.
+
+    Args:
+        matcher (WordMatcher): The matcher of the words to format.
+        texts (List[str]): The text of each paragraph.
+        min_chars (int): The total length of text below which the paragraphs are matched in
+            the calling thread.
+
+    Returns:
+        ParagraphMatches: The sorted (start, end) offsets of the matches of each paragraph.
+    """
+    if MAX_PROCESSES < 2 or not matcher.words or sum(len(text) for text in texts) < min_chars:
+        return [matcher.find_ranges(text) for text in texts]
+
+    chunks = split_chunks(texts, MAX_PROCESSES * CHUNKS_PER_PROCESS)
+    words = tuple(matcher.words)
+    try:
+        results = list(_get_pool().map(_match_chunk, [words] * len(chunks), [matcher.ignore_case] * len(chunks), chunks))
+    except (BrokenProcessPool, OSError) as e:
+        print(f"Ricerca parallela non disponibile, ricerca sequenziale: {e}")
+        _reset_pool()
+        return [matcher.find_ranges(text) for text in texts]
+
+    count('parallel_chunks', len(chunks))
+    return [matches for chunk_matches in results for matches in chunk_matches]
@@ -0,0 +1,95 @@
+import json
+from typing import List, Dict, Any, Tuple, NamedTuple
+from functions.text_index import Segment, make_range
+
+# Ranges to format, grouped by the segment they belong to and the field mask to update on them
+StyleRanges = Dict[Tuple[Segment, str], List[Tuple[int, int]]]
+
+# Limits for a single batchUpdate call, kept well below the ones enforced by the Docs API
+MAX_REQUESTS_PER_BATCH = 500
+MAX_BATCH_BYTES = 1_000_000
+
+class BatchPlan(NamedTuple):
+    """The batchUpdate calls planned for a set of style updates."""
+    batches: List[List[Dict[str, Any]]]  # The requests of each batchUpdate call
+    requests_count: int  # The number of requests after coalescing
+    saved_requests: int  # The number of requests removed by coalescing
+    payload_bytes: int  # The estimated size of all the request bodies
+
+def coalesce_ranges(ranges: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """
+    Merge adjacent or overlapping ranges.
+
+    Args:
+        ranges (List[Tuple[int, int]]): The (start, end) ranges, in any order.
+
+    Returns:
+        List[Tuple[int, int]]: The merged ranges, sorted by position.
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+def _request_size(request: Dict[str, Any]) -> int:
+    """Estimate the size in bytes of a request once serialized in the batch body."""
+    return len(json.dumps(request, separators=(',', ':'))) + 1  # Separator between requests
+
+def plan_batches(
+    ranges_by_fields: StyleRanges,  # The (start, end) ranges to format, grouped by segment and field mask
+    text_style: Dict[str, bool],  # The text style to apply
+    max_requests: int = MAX_REQUESTS_PER_BATCH,  # The maximum number of requests per batch
+    max_bytes: int = MAX_BATCH_BYTES  # The maximum size of the requests of a batch
+) -> BatchPlan:
+    """
+    Coalesce the ranges sharing the same segment and field mask and split the requests into batches.
+
+    Args:
+        ranges_by_fields (StyleRanges): The (start, end) ranges to format, grouped by their
+            (tabId, segmentId) and the field mask (e.g. 'bold,italic') to update on them.
+        text_style (Dict[str, bool]): The text style to apply; each request only carries the
+            fields of its mask.
+        max_requests (int): The maximum number of requests per batchUpdate call.
+        max_bytes (int): The maximum size in bytes of the requests of a batchUpdate call.
+
+    Returns:
+        BatchPlan: The batches to send and the statistics of the plan.
+    """
+    batches = []
+    batch = []
+    batch_bytes = 0
+    payload_bytes = 0
+    ranges_count = 0
+    requests_count = 0
+
+    for (segment, fields), ranges in ranges_by_fields.items():
+        masked_style = {field: text_style[field] for field in fields.split(',')}
+        coalesced = coalesce_ranges(ranges)
+        ranges_count += len(ranges)
+        requests_count += len(coalesced)
+
+        for start_index, end_index in coalesced:
+            request = {
+                'updateTextStyle': {
+                    'range': make_range(start_index, end_index, segment),
+                    'textStyle': masked_style,
+                    'fields': fields
+                }
+            }
+            size = _request_size(request)
+            if batch and (len(batch) >= max_requests or batch_bytes + size > max_bytes):
+                batches.append(batch)
+                batch = []
+                batch_bytes = 0
+            batch.append(request)
+            batch_bytes += size
+            payload_bytes += size
+
+    if batch:
+        batches.append(batch)
+
+    return BatchPlan(batches, requests_count, ranges_count - requests_count, payload_bytes)
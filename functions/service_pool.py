@@ -0,0 +1,113 @@
+import json
+import time
+import queue
+import threading
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Any, Dict, Iterator, TYPE_CHECKING
+from utils.metrics import log_metrics
+
+if TYPE_CHECKING:
+    from google.oauth2.credentials import Credentials
+
+# Maximum number of HTTP sessions open at the same time
+POOL_SIZE = 6
+HTTP_TIMEOUT = 60  # Seconds
+
+@lru_cache(maxsize=None)
+def _discovery_document() -> Dict[str, Any]:
+    """
+    Load the Docs API discovery document bundled with googleapiclient, parsing it only once.
+
+    Older bundled documents predate document tabs: the `includeTabsContent` parameter of
+    documents.get is added when missing, so the client library accepts it.
+    """
+    from googleapiclient import discovery_cache
+    document = json.loads(discovery_cache.get_static_doc('docs', 'v1'))
+    parameters = document['resources']['documents']['methods']['get'].setdefault('parameters', {})
+    parameters.setdefault('includeTabsContent', {'type': 'boolean', 'location': 'query'})
+    return document
+
+def reuse_resources(service: Any) -> Any:
+    """
+    Make `service.documents()` return the same resource object on every call.
+
+    The client library rebuilds the resource, and every method of it, from the discovery
+    document on each call, which costs tens of milliseconds; the resource holds no state of
+    its own, so it can be shared by all the requests of the service object.
+    """
+    documents = service.documents()
+    service.documents = lambda: documents
+    return service
+
+class ServicePool:
+    """
+    Pool of Google Docs API service objects, each with its own authorized HTTP session.
+
+    httplib2 connections are not thread-safe, so a service object must only be used by one
+    thread at a time: `lease` hands one out exclusively and takes it back afterwards, keeping
+    its connections open for the next caller. All the sessions share the same credentials,
+    which are refreshed once under a lock instead of by every session.
+    """
+
+    def __init__(self, credentials: 'Credentials', size: int = POOL_SIZE) -> None:
+        self.credentials = credentials
+        self.size = size
+        self._idle: 'queue.LifoQueue[Any]' = queue.LifoQueue()  # The most recently used session is the warmest
+        self._created = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def _ensure_valid_credentials(self) -> None:
+        """Refresh the shared credentials if they are expired."""
+        if self.credentials.valid:
+            return
+        with self._refresh_lock:
+            if not self.credentials.valid:
+                from google.auth.transport.requests import Request
+                started = time.perf_counter()
+                self.credentials.refresh(Request())
+                log_metrics('auth_refresh', seconds=round(time.perf_counter() - started, 4))
+
+    def _new_service(self) -> Any:
+        """Build a service object with a new authorized HTTP session, without any network call."""
+        # Imported here: these modules are slow to load and not needed to show the window
+        import httplib2
+        from google_auth_httplib2 import AuthorizedHttp
+        from googleapiclient.discovery import build_from_document
+
+        authorized_http = AuthorizedHttp(self.credentials, http=httplib2.Http(timeout=HTTP_TIMEOUT))
+        return reuse_resources(build_from_document(_discovery_document(), http=authorized_http))
+
+    @contextmanager
+    def lease(self) -> Iterator[Any]:
+        """
+        Borrow a service object for the exclusive use of the current thread.
+
+        Blocks while all the sessions of the pool are in use.
+
+        Yields:
+            Any: The Google Docs API service object.
+        """
+        self._ensure_valid_credentials()
+        try:
+            service = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    service = self._new_service()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                service = self._idle.get()
+
+        try:
+            yield service
+        finally:
+            self._idle.put(service)
@@ -0,0 +1,136 @@
+from typing import Any, BinaryIO, Dict, List, Optional, Tuple
+from functions.text_index import ParagraphIndex, index_paragraph
+
+try:
+    import ijson  # Optional: without it, responses are always decoded whole
+except ImportError:
+    ijson = None
+
+# Responses smaller than this are decoded whole: json is faster, and the tree of a small
+# document takes little memory anyway
+STREAM_MIN_BYTES = 2_000_000
+
+# Segments of a tab, in the order `iter_paragraphs` visits them
+SEGMENT_KINDS = ('body', 'headers', 'footers', 'footnotes')
+
+# Keys leading from a paragraph in a table cell up to the `content` list holding the table
+_TABLE_PATH = ['table', 'tableRows', None, 'tableCells', None, 'content', None]
+
+def streaming_available() -> bool:
+    """Return whether the optional ijson package is installed."""
+    return ijson is not None
+
+def _content_path(path: List[Optional[str]]) -> bool:
+    """
+    Check that a path ends in a paragraph reached the way `iter_paragraphs` walks a segment:
+    through its `content` list and nested table cells only.
+    """
+    if len(path) < 3 or path[:2] != ['content', None] or path[-1] != 'paragraph':
+        return False
+    middle = path[2:-1]
+    return len(middle) % len(_TABLE_PATH) == 0 and all(
+        middle[position:position + len(_TABLE_PATH)] == _TABLE_PATH
+        for position in range(0, len(middle), len(_TABLE_PATH))
+    )
+
+def _intern_styles(paragraph: ParagraphIndex, styles: Dict[Any, Dict[str, Any]]) -> None:
+    """Make the runs with the same text style share one dictionary; the styles are never modified in place."""
+    for element, style in enumerate(paragraph.styles):
+        if style is None:
+            continue
+        try:
+            key = frozenset(style.items())
+        except TypeError:
+            continue  # Nested values (colors, fonts) of headers and footers
+        paragraph.styles[element] = styles.setdefault(key, style)
+
+def stream_text_index(stream: BinaryIO) -> Tuple[Optional[str], List[ParagraphIndex]]:
+    """
+    Build the text index of a `documents.get` response while it is parsed, without the document tree.
+
+    The JSON events are followed with a stack of the keys leading to the current value. Only
+    one paragraph at a time is turned into a dictionary, indexed and dropped; everything
+    else is skipped as it goes by. The paragraphs are returned in the same order, and with the
+    same segments, as `build_text_index` gives for the decoded document, whatever the order of
+    the keys in the response.
+
+    Args:
+        stream (BinaryIO): The body of the response.
+
+    Returns:
+        Tuple[Optional[str], List[ParagraphIndex]]: The revisionId of the document and the index
+        of every non-empty paragraph.
+    """
+    path: List[Optional[str]] = []  # Current key of each open object, None for each open list
+    tabs: List[Tuple[int, int]] = []  # (position in `path`, pre-order number) of the open tabs
+    tab_ids: Dict[int, str] = {}
+    tab_count = 0
+    has_tabs = False
+    # Paragraphs of each segment, keyed by (tab number, kind, order of the segment in its kind)
+    buckets: Dict[Tuple[int, int, int], Tuple[str, List[ParagraphIndex]]] = {}
+    bucket: List[ParagraphIndex] = []
+    segment_orders: Dict[Tuple[int, int], Dict[str, int]] = {}
+    styles: Dict[Any, Dict[str, Any]] = {}
+    revision_id = None
+    builder = None
+    builder_depth = 0
+
+    for event, value in ijson.basic_parse(stream, use_float=True):
+        if builder is not None:
+            # Inside a paragraph: build it, then index it once it is complete
+            builder.event(event, value)
+            if event in ('start_map', 'start_array'):
+                builder_depth += 1
+            elif event in ('end_map', 'end_array'):
+                builder_depth -= 1
+                if not builder_depth:
+                    index = index_paragraph(builder.value)  # The segment is set at the end, once the tab IDs are known
+                    if index.text:
+                        _intern_styles(index, styles)
+                        bucket.append(index)
+                    builder = None
+            continue
+
+        if event == 'map_key':
+            path[-1] = value
+            has_tabs = has_tabs or path == ['tabs']
+        elif event in ('start_map', 'start_array'):
+            if event == 'start_map':
+                if path == ['tabs', None] or (tabs and len(path) == tabs[-1][0] + 2 and path[-2:] == ['childTabs', None]):
+                    tabs.append((len(path), tab_count))
+                    tab_count += 1
+                elif path and path[-1] == 'paragraph':
+                    # The segment holder is the documentTab of the innermost tab, or the document itself
+                    holder = tabs[-1][0] + 1 if tabs else 0
+                    if not tabs or path[holder - 1] == 'documentTab':
+                        kind = path[holder] if len(path) > holder else None
+                        content = holder + 1 if kind == 'body' else holder + 2
+                        if kind in SEGMENT_KINDS and _content_path(path[content:]):
+                            tab_number = tabs[-1][1] if tabs else -1
+                            segment_id = '' if kind == 'body' else path[holder + 1]
+                            orders = segment_orders.setdefault((tab_number, SEGMENT_KINDS.index(kind)), {})
+                            key = (tab_number, SEGMENT_KINDS.index(kind), orders.setdefault(segment_id, len(orders)))
+                            bucket = buckets.setdefault(key, (segment_id, []))[1]
+                            builder = ijson.ObjectBuilder()
+                            builder.event(event, value)
+                            builder_depth = 1
+                            continue
+            path.append(None)
+        elif event in ('end_map', 'end_array'):
+            path.pop()
+            if tabs and event == 'end_map' and len(path) == tabs[-1][0]:
+                tabs.pop()
+        elif event == 'string':
+            if path == ['revisionId']:
+                revision_id = value
+            elif tabs and len(path) == tabs[-1][0] + 2 and path[-2:] == ['tabProperties', 'tabId']:
+                tab_ids[tabs[-1][1]] = value
+
+    # Like `build_text_index`, the top-level content only counts for documents without tabs
+    paragraphs = []
+    for (tab_number, _, _), (segment_id, bucket_paragraphs) in sorted(buckets.items()):
+        if tab_number >= 0 or not has_tabs:
+            for paragraph in bucket_paragraphs:
+                paragraph.segment = (tab_ids.get(tab_number, ''), segment_id)
+                paragraphs.append(paragraph)
+    return revision_id, paragraphs
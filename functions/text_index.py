@@ -0,0 +1,260 @@
+from array import array
+from bisect import bisect_right
+from typing import List, Dict, Any, Tuple, Iterator, Iterable, Optional
+
+# Where a paragraph lives: (tabId, segmentId). Indexes restart in every segment: the body has
+# an empty segmentId, headers, footers and footnotes have their own ID, and documents without
+# tabs (or fetched without their content) have an empty tabId
+Segment = Tuple[str, str]
+BODY_SEGMENT: Segment = ('', '')
+
+# Character used in place of non-text elements (images, footnote references, ...) so they
+# keep their length in the flattened text and break words like the original runs did
+OBJECT_PLACEHOLDER = '\ufffc'
+
+class ParagraphIndex:
+    """
+    Flattened text of a paragraph with a compact offset table back to the Docs indexes.
+
+    The text of every element of the paragraph is joined in a single string; `offsets[i]` is
+    the position in that string where element `i` begins, `start_indexes[i]` is the
+    `startIndex` of the same element in the document and `styles[i]` is its `textStyle`
+    (None for non-text elements). `segment` tells which tab and segment the indexes refer to.
+    """
+
+    __slots__ = ('text', 'offsets', 'start_indexes', 'styles', 'segment')
+
+    def __init__(self, text: str, offsets: array, start_indexes: array, styles: List[Optional[Dict[str, Any]]], segment: Segment = BODY_SEGMENT) -> None:
+        self.text = text
+        self.offsets = offsets
+        self.start_indexes = start_indexes
+        self.styles = styles
+        self.segment = segment
+
+    def to_document_index(self, offset: int) -> int:
+        """Convert a position in the flattened text into a Docs index."""
+        element = bisect_right(self.offsets, offset) - 1
+        return self.start_indexes[element] + offset - self.offsets[element]
+
+    def to_document_range(self, start: int, end: int) -> Tuple[int, int]:
+        """
+        Convert a (start, end) range of the flattened text into a Docs range.
+
+        The range may span several text runs: the end is resolved through the element that
+        holds the last character, so it stays exact even if the runs are not contiguous.
+        """
+        return self.to_document_index(start), self.to_document_index(end - 1) + 1
+
+    def split_range(self, start: int, end: int) -> Iterator[Tuple[int, int, Optional[Dict[str, Any]]]]:
+        """
+        Split a range of the flattened text into the pieces covered by each element.
+
+        Yields:
+            Tuple[int, int, Optional[Dict[str, Any]]]: The Docs range of each piece and the
+            current `textStyle` of its element (None for non-text elements).
+        """
+        element = bisect_right(self.offsets, start) - 1
+        while start < end:
+            element_end = self.offsets[element + 1] if element + 1 < len(self.offsets) else len(self.text)
+            piece_end = min(end, element_end)
+            document_start = self.start_indexes[element] + start - self.offsets[element]
+            yield document_start, document_start + piece_end - start, self.styles[element]
+            start = piece_end
+            element += 1
+
+    def styles_between(self, start_index: int, end_index: int) -> Iterator[Tuple[int, int, Dict[str, Any]]]:
+        """
+        Split a Docs range into the pieces covered by each text element of the paragraph.
+
+        Yields:
+            Tuple[int, int, Dict[str, Any]]: The Docs range of each piece inside the paragraph
+            and the current `textStyle` of its element. Non-text elements are skipped.
+        """
+        element = max(bisect_right(self.start_indexes, start_index) - 1, 0)
+        while element < len(self.styles) and self.start_indexes[element] < end_index:
+            element_start = self.start_indexes[element]
+            element_end = element_start + (self.offsets[element + 1] if element + 1 < len(self.offsets) else len(self.text)) - self.offsets[element]
+            piece_start = max(start_index, element_start)
+            piece_end = min(end_index, element_end)
+            if piece_start < piece_end and self.styles[element] is not None:
+                yield piece_start, piece_end, self.styles[element]
+            element += 1
+
+    def with_text_style(self, start_index: int, end_index: int, text_style: Dict[str, Any]) -> 'ParagraphIndex':
+        """
+        Return a copy of the index with a text style applied to a Docs range.
+
+        The elements crossing the boundaries of the range are split, as the Docs API does
+        with the text runs, so the copy matches the document after the update. Fields set to
+        None in `text_style` are removed, as the API does with the fields of the mask left unset.
+        """
+        offsets = array('l')
+        start_indexes = array('l')
+        styles = []
+
+        for element, style in enumerate(self.styles):
+            element_offset = self.offsets[element]
+            element_start = self.start_indexes[element]
+            element_end = element_start + (self.offsets[element + 1] if element + 1 < len(self.offsets) else len(self.text)) - element_offset
+
+            if style is None or element_end <= start_index or element_start >= end_index:
+                pieces = [(element_start, style)]
+            else:
+                updated_start = max(start_index, element_start)
+                updated_end = min(end_index, element_end)
+                updated_style = {field: value for field, value in {**style, **text_style}.items() if value is not None}
+                pieces = [(element_start, style), (updated_start, updated_style), (updated_end, style)]
+                pieces = [piece for piece, next_piece in zip(pieces, pieces[1:] + [(element_end, None)]) if piece[0] < next_piece[0]]
+
+            for piece_start, piece_style in pieces:
+                offsets.append(element_offset + piece_start - element_start)
+                start_indexes.append(piece_start)
+                styles.append(piece_style)
+
+        return ParagraphIndex(self.text, offsets, start_indexes, styles, self.segment)
+
+def index_paragraph(paragraph: Dict[str, Any], segment: Segment = BODY_SEGMENT) -> ParagraphIndex:
+    """
+    Build the flattened text index of a paragraph.
+
+    Args:
+        paragraph (Dict[str, Any]): The `paragraph` object of a structural element.
+        segment (Segment): The tab and segment the paragraph belongs to.
+
+    Returns:
+        ParagraphIndex: The index of the paragraph.
+    """
+    parts = []
+    offsets = array('l')
+    start_indexes = array('l')
+    styles = []
+    length = 0
+
+    for paragraph_element in paragraph.get('elements', []):
+        # The API leaves out indexes equal to 0, e.g. on the first run of every header, footer and footnote
+        start_index = paragraph_element.get('startIndex', 0)
+        if 'textRun' in paragraph_element and 'content' in paragraph_element['textRun']:
+            text = paragraph_element['textRun']['content']
+            style = paragraph_element['textRun'].get('textStyle', {})
+        else:
+            end_index = paragraph_element.get('endIndex', start_index + 1)
+            text = OBJECT_PLACEHOLDER * (end_index - start_index)
+            style = None
+        if not text:
+            continue
+        offsets.append(length)
+        start_indexes.append(start_index)
+        styles.append(style)
+        parts.append(text)
+        length += len(text)
+
+    return ParagraphIndex(''.join(parts), offsets, start_indexes, styles, segment)
+
+def _iter_tabs(doc: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Yield the ID and the content holder of every tab, child tabs included, in display order.
+
+    Documents fetched without `includeTabsContent` keep their content at the top level, which
+    is yielded as a single tab with an empty ID.
+    """
+    if 'tabs' not in doc:
+        yield '', doc
+        return
+    stack = list(reversed(doc['tabs']))
+    while stack:
+        tab = stack.pop()
+        yield tab.get('tabProperties', {}).get('tabId', ''), tab.get('documentTab', {})
+        stack.extend(reversed(tab.get('childTabs', [])))
+
+def _iter_segments(holder: Dict[str, Any]) -> Iterator[Tuple[str, List[Dict[str, Any]]]]:
+    """Yield the segment ID and the structural elements of the body, headers, footers and footnotes."""
+    yield '', holder.get('body', {}).get('content', [])
+    for kind in ('headers', 'footers', 'footnotes'):
+        for segment_id, segment in holder.get(kind, {}).items():
+            yield segment_id, segment.get('content', [])
+
+def iter_paragraphs(doc: Dict[str, Any]) -> Iterator[Tuple[Segment, Dict[str, Any]]]:
+    """
+    Walk the whole document and yield every paragraph with the segment it belongs to.
+
+    Tabs, segments and nested tables are visited with explicit stacks of iterators instead of
+    recursion, and the paragraphs are yielded as they are found, without copying any part of
+    the document. Tables of contents are skipped, since Docs regenerates their text.
+
+    Args:
+        doc (Dict[str, Any]): The document returned by `documents.get`.
+
+    Yields:
+        Tuple[Segment, Dict[str, Any]]: The (tabId, segmentId) and the `paragraph` object.
+    """
+    for tab_id, holder in _iter_tabs(doc):
+        for segment_id, content in _iter_segments(holder):
+            segment = (tab_id, segment_id)
+            stack: List[Iterator[Dict[str, Any]]] = [iter(content)]
+            while stack:
+                element = next(stack[-1], None)
+                if element is None:
+                    stack.pop()
+                elif 'paragraph' in element:
+                    yield segment, element['paragraph']
+                elif 'table' in element:
+                    stack.append(
+                        cell_element
+                        for row in element['table'].get('tableRows', [])
+                        for cell in row.get('tableCells', [])
+                        for cell_element in cell.get('content', [])
+                    )
+
+def index_by_segment(paragraphs: Iterable[ParagraphIndex]) -> Dict[Segment, Tuple[List[int], List[int]]]:
+    """
+    Map each segment to the start indexes of its paragraphs and their positions in the list.
+
+    Within a segment the paragraphs are in document order, so the start indexes are sorted
+    and the paragraphs overlapping a range can be found by binary search.
+    """
+    lookup: Dict[Segment, Tuple[List[int], List[int]]] = {}
+    for position, paragraph in enumerate(paragraphs):
+        starts, positions = lookup.setdefault(paragraph.segment, ([], []))
+        starts.append(paragraph.start_indexes[0])
+        positions.append(position)
+    return lookup
+
+def overlapping_paragraphs(lookup: Dict[Segment, Tuple[List[int], List[int]]], segment: Segment, start_index: int, end_index: int) -> Iterator[int]:
+    """Yield the positions of the paragraphs of a segment that overlap a Docs range."""
+    starts, positions = lookup.get(segment, ([], []))
+    current = max(bisect_right(starts, start_index) - 1, 0)
+    while current < len(starts) and starts[current] < end_index:
+        yield positions[current]
+        current += 1
+
+def range_segment(document_range: Dict[str, Any]) -> Segment:
+    """Return the segment of a `range` object of a request."""
+    return document_range.get('tabId', ''), document_range.get('segmentId', '')
+
+def make_range(start_index: int, end_index: int, segment: Segment = BODY_SEGMENT) -> Dict[str, Any]:
+    """Build the `range` object of a request, leaving out the empty IDs."""
+    document_range: Dict[str, Any] = {'startIndex': start_index, 'endIndex': end_index}
+    tab_id, segment_id = segment
+    if segment_id:
+        document_range['segmentId'] = segment_id
+    if tab_id:
+        document_range['tabId'] = tab_id
+    return document_range
+
+def build_text_index(doc: Dict[str, Any]) -> List[ParagraphIndex]:
+    """
+    Build the flattened text index of every paragraph of the document.
+
+    Args:
+        doc (Dict[str, Any]): The document returned by `documents.get`.
+
+    Returns:
+        List[ParagraphIndex]: One index per non-empty paragraph of every tab and segment
+        (body, tables, headers, footers and footnotes), in traversal order.
+    """
+    paragraphs = []
+    for segment, paragraph in iter_paragraphs(doc):
+        index = index_paragraph(paragraph, segment)
+        if index.text:
+            paragraphs.append(index)
+    return paragraphs
@@ -2,23 +2,51 @@ import tkinter as tk
 from tkinter import ttk, font, messagebox
 from utils.styles import style_options, dark_bg, dark_fg, accent_color, configure_styles
 from functions.favorites import (
-    update_favorites_list,
-    save_reordered_favorites,
+    FavoritesListView,
+    save_favorites,
     add_favorite,
     remove_favorite,
     import_favorite,
     edit_favorite,
+    select_favorites_dialog,
 )
-from functions.google_docs import toggle_formatting
-import threading
-from typing import Dict
-
-def create_gui(service: object, favorites: Dict[str, str], version: str) -> None:
+from functions.favorites_model import FavoritesModel
+from functions.google_docs import toggle_formatting, undo_formatting
+from functions.batch import apply_to_documents
+from functions.service_pool import ServicePool
+from functions.updater import prompt_update
+from functions.jobs import Job, JobEvent
+from functions.match_preview import MatchPreviewPanel
+from functions.watcher import DocumentWatcher, WATCH_INTERVAL
+from utils.timing import StartupTimer
+from utils.metrics import log_metrics
+from functions.api_client import api_stats
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Tuple, Optional
+
+# Text shown for each phase of a formatting job
+PHASE_LABELS = {
+    'fetch': "Download del documento...",
+    'match': "Ricerca delle parole...",
+    'send': "Invio blocco {current}/{total}...",
+    'document': "Documenti elaborati: {current}/{total}",
+}
+
+def create_gui(
+    service_pool: 'Future[ServicePool]',
+    favorites: FavoritesModel,
+    version: str,
+    latest_release: Optional['Future[Optional[Dict[str, Any]]]'] = None,
+    startup_timer: Optional[StartupTimer] = None
+) -> None:
     """Create the GUI and handle events.
 
     Args:
-        service (object): The Google Docs API service object.
-        favorites (Dict[str, str]): A dictionary of favorite documents.
+        service_pool (Future[ServicePool]): The pool of Google Docs API service objects, ready once authenticated.
+        favorites (FavoritesModel): The favorite documents.
+        latest_release (Future, optional): The latest release, fetched in the background. Defaults to None.
+        startup_timer (StartupTimer, optional): The timer of the startup steps. Defaults to None.
     """
     # GUI setup
     root = tk.Tk()
@@ -39,6 +67,7 @@ def create_gui(service: object, favorites: Dict[str, str], version: str) -> None
         """
         widget = event.widget
         widget.dragged_item_index = widget.nearest(event.y)
+        widget.drag_moved = False
 
     def on_drag_motion(event: tk.Event) -> None:
         """Handle the dragging motion.
@@ -50,12 +79,12 @@ def create_gui(service: object, favorites: Dict[str, str], version: str) -> None
         dragged_item_index = widget.dragged_item_index
         target_index = widget.nearest(event.y)
 
-        if dragged_item_index != target_index:
-            # Swap the items in the Listbox
-            dragged_item = widget.get(dragged_item_index)
-            widget.delete(dragged_item_index)
-            widget.insert(target_index, dragged_item)
-            widget.dragged_item_index = target_index
+        if dragged_item_index != target_index and 0 <= dragged_item_index < widget.size():
+            # Move the favorite in the unfiltered order, next to the target; the Listbox follows through the model
+            dragged_name = favorites_view.name_at(dragged_item_index)
+            favorites.move(dragged_name, favorites.index(favorites_view.name_at(target_index)))
+            widget.dragged_item_index = favorites_view.row_of(dragged_name)
+            widget.drag_moved = True
 
     def on_drag_release(event: tk.Event) -> None:
         """Handle the release of the dragged item.
@@ -63,7 +92,8 @@ def create_gui(service: object, favorites: Dict[str, str], version: str) -> None
         Args:
             event (tk.Event): The drag release event.
         """
-        save_reordered_favorites(favorites, favorites_listbox)
+        if getattr(event.widget, "drag_moved", False):
+            save_favorites(favorites)
 
     def on_listbox_select(event: tk.Event) -> None:
         """Store the selected document name and update the label.
@@ -75,6 +105,7 @@ def create_gui(service: object, favorites: Dict[str, str], version: str) -> None
         if selected_indices:
             selected_name = favorites_listbox.get(selected_indices[0])
             selected_document_name.set(f"Documento selezionato: {selected_name}")
+            match_preview.set_document(favorites[selected_name].split('/')[-2])
 
     def restore_selection(event: tk.Event = None) -> None:
         """Restore the previously selected document in the Listbox.
@@ -84,10 +115,25 @@ def create_gui(service: object, favorites: Dict[str, str], version: str) -> None
         """
         current_document = selected_document_name.get().replace("Documento selezionato: ", "")
         if current_document in favorites:
-            index = list(favorites.keys()).index(current_document)
-            favorites_listbox.selection_clear(0, "end")  # Clear any existing selection
-            favorites_listbox.selection_set(index)  # Reselect the previously selected document
-            favorites_listbox.activate(index)  # Ensure the selection is visually highlighted
+            favorites_view.select(current_document)  # Reselect the previously selected document, if visible
+
+    def read_formatting_inputs() -> Optional[Tuple[List[str], Dict[str, bool], bool, bool]]:
+        """Read the words and the formatting options, or show an error and return None."""
+        words = text_box.get("1.0", tk.END).strip().split(',')
+        if words == ['']:
+            messagebox.showerror("Errore", "Inserisci almeno una parola.")
+            return None
+        ignore_case = ignore_case_var.get()
+        diff = not overwrite_var.get()
+
+        # Get formatting options from checkboxes
+        formatting_options = {
+            'bold': bold_var.get(),
+            'italic': italic_var.get(),
+            'underline': underline_var.get(),
+            'strikethrough': strikethrough_var.get()
+        }
+        return words, formatting_options, ignore_case, diff
 
     def process_text() -> None:
         """Process the text to apply formatting in a separate thread."""
@@ -103,40 +149,202 @@ def create_gui(service: object, favorites: Dict[str, str], version: str) -> None
             return
 
         document_id = favorites[current_document].split('/')[-2]
-        words = text_box.get("1.0", tk.END).strip().split(',')
-        if words == ['']:
-            messagebox.showerror("Errore", "Inserisci almeno una parola.")
+        inputs = read_formatting_inputs()
+        if inputs is None:
             return
-        ignore_case = ignore_case_var.get()
+        words, formatting_options, ignore_case, diff = inputs
 
-        # Get formatting options from checkboxes
-        formatting_options = {
-            'bold': bold_var.get(),
-            'italic': italic_var.get(),
-            'underline': underline_var.get(),
-            'strikethrough': strikethrough_var.get()
-        }
+        def run_toggle_formatting(job: Job) -> int:
+            """Run the toggle formatting operation in the worker thread of the job."""
+            with service_pool.result().lease() as service:
+                return toggle_formatting(service, document_id, words, formatting_options, ignore_case, diff, job.report)
 
-        # Show spinner
-        spinner_label.config(text="Elaborazione in corso...", fg="white")
-        spinner_label.pack()
-
-        def run_toggle_formatting() -> None:
-            """Run the toggle formatting operation in a separate thread."""
-            try:
-                changes_count = toggle_formatting(service, document_id, words, formatting_options, ignore_case)
-                if changes_count == 0:
-                    messagebox.showinfo("Informazione", "Nessuna modifica effettuata.")
-                else:
-                    messagebox.showinfo("Successo", f"Formattazione del testo aggiornata con successo. {changes_count} modifiche apportate.")
-            except Exception as error:
-                print(error)
-                messagebox.showerror("Errore", f"Si è verificato un errore: {error}")
-            finally:
-                # Hide spinner
-                spinner_label.pack_forget()
-
-        threading.Thread(target=run_toggle_formatting).start()
+        def show_result(changes_count: int) -> None:
+            if changes_count == 0:
+                messagebox.showinfo("Informazione", "Nessuna modifica effettuata.")
+            else:
+                messagebox.showinfo("Successo", f"Formattazione del testo aggiornata con successo. {changes_count} modifiche apportate.")
+
+        start_job(run_toggle_formatting, show_result, "Elaborazione in corso...")
+
+    def process_multiple() -> None:
+        """Apply the formatting to several favorites at once in a separate thread."""
+        inputs = read_formatting_inputs()
+        if inputs is None:
+            return
+        words, formatting_options, ignore_case, diff = inputs
+
+        selected_names = select_favorites_dialog(favorites)
+        if not selected_names:
+            return
+        documents = [(name, favorites[name].split('/')[-2]) for name in selected_names]
+
+        def run_apply_to_documents(job: Job) -> List[Any]:
+            """Run the formatting of all the selected documents in the worker thread of the job."""
+            done = []
+            def on_result(result: Any) -> None:
+                done.append(result)
+                job.notify('document', len(done), len(documents))
+            return apply_to_documents(
+                service_pool.result(), documents, words, formatting_options, ignore_case, diff,
+                on_result=on_result, on_progress=lambda phase, current, total: job.check_cancelled()
+            )
+
+        def show_results(results: List[Any]) -> None:
+            failed = [result for result in results if result.error]
+            lines = [
+                f"{result.name}: errore ({result.error})" if result.error else f"{result.name}: {result.changes_count} modifiche"
+                for result in results
+            ]
+            if failed:
+                messagebox.showwarning("Completato con errori", f"{len(failed)} documenti su {len(results)} non elaborati.\n\n" + "\n".join(lines))
+            else:
+                messagebox.showinfo("Successo", "Formattazione del testo aggiornata con successo.\n\n" + "\n".join(lines))
+
+        start_job(run_apply_to_documents, show_results, f"Elaborazione di {len(documents)} documenti in corso...")
+
+    def process_undo() -> None:
+        """Undo the last formatting of the selected document in a separate thread."""
+        current_document = selected_document_name.get().replace("Documento selezionato: ", "")
+        if current_document not in favorites:
+            messagebox.showerror("Errore", "Seleziona un documento preferito.")
+            return
+        document_id = favorites[current_document].split('/')[-2]
+
+        def run_undo_formatting(job: Job) -> int:
+            """Send the inverse update in the worker thread of the job."""
+            job.report('send', 1, 1)
+            with service_pool.result().lease() as service:
+                return undo_formatting(service, document_id)
+
+        start_job(run_undo_formatting, lambda ranges_count: messagebox.showinfo("Successo", f"Formattazione annullata: {ranges_count} intervalli ripristinati."), "Annullamento in corso...")
+
+    def toggle_watch() -> None:
+        """Start watching the selected document, or stop the running watch."""
+        if watch_job:
+            watch_job[0].cancel()
+            watch_button.config(text="Sorveglia documento")
+            watch_label.config(text="Interruzione della sorveglianza...")
+            return
+
+        current_document = selected_document_name.get().replace("Documento selezionato: ", "")
+        if current_document not in favorites:
+            messagebox.showerror("Errore", "Seleziona un documento preferito.")
+            return
+        inputs = read_formatting_inputs()
+        if inputs is None:
+            return
+        words, formatting_options, ignore_case, diff = inputs
+        watcher = DocumentWatcher(favorites[current_document].split('/')[-2], words, formatting_options, ignore_case, diff)
+
+        def run_watch(job: Job) -> None:
+            """Check the document periodically in the worker thread of the job, until cancelled."""
+            while True:
+                try:
+                    with service_pool.result().lease() as service:
+                        result = watcher.check(service)
+                    job.notify('watch', value=result)
+                except Exception as error:
+                    # A failed check is retried at the next interval instead of ending the watch
+                    print(f"Controllo del documento non riuscito: {error}")
+                    job.notify('watch', value=error)
+                job.wait(WATCH_INTERVAL)
+
+        job = Job(run_watch)
+        watch_job.append(job)
+        watch_button.config(text="Interrompi sorveglianza")
+        watch_label.config(text=f"Sorveglianza di {current_document} avviata")
+        job.start()
+        root.after(100, poll_watch, job, current_document)
+
+    def poll_watch(job: Job, document_name: str) -> None:
+        """Show the outcome of the checks of the watched document, on the Tk main thread."""
+        event = job.poll()
+        while event is not None:
+            if event.kind != 'progress':
+                # The watch was stopped
+                watch_job.clear()
+                watch_label.config(text="")
+                return
+            checked_at = time.strftime("%H:%M:%S")
+            if isinstance(event.value, Exception):
+                watch_label.config(text=f"{document_name}: controllo non riuscito alle {checked_at} ({event.value})")
+            elif event.value is None:
+                watch_label.config(text=f"{document_name}: nessuna modifica al documento ({checked_at})")
+            else:
+                result = event.value
+                watch_label.config(text=(
+                    f"{document_name}: {result.scanned_paragraphs} paragrafi su {result.total_paragraphs} ricontrollati, "
+                    f"{result.changes_count} modifiche ({checked_at})"
+                ))
+            event = job.poll()
+        root.after(500, poll_watch, job, document_name)
+
+    def start_job(work: Callable[[Job], Any], on_done: Callable[[Any], None], description: str) -> None:
+        """Run a formatting job in the background, showing its progress and a cancel button.
+
+        Args:
+            work (Callable[[Job], Any]): The function run in the worker thread.
+            on_done (Callable[[Any], None]): Called on the Tk main thread with the result of the job.
+            description (str): The text shown until the first progress event.
+        """
+        if current_job:
+            messagebox.showerror("Errore", "Un'elaborazione è già in corso.")
+            return
+
+        job = Job(work)
+        current_job.append(job)
+        progress_label.config(text=description)
+        progress_bar.config(mode="indeterminate")
+        progress_bar.start()
+        cancel_button.state(["!disabled"])
+        progress_frame.pack()
+        job.start()
+        root.after(100, poll_job, job, on_done)
+
+    def poll_job(job: Job, on_done: Callable[[Any], None]) -> None:
+        """Show the events of a running job, on the Tk main thread.
+
+        Args:
+            job (Job): The running job.
+            on_done (Callable[[Any], None]): Called with the result of the job once it completes.
+        """
+        event = job.poll()
+        while event is not None and event.kind == 'progress':
+            show_progress(event)
+            event = job.poll()
+        if event is None:
+            root.after(100, poll_job, job, on_done)
+            return
+
+        # The job is over
+        current_job.clear()
+        progress_bar.stop()
+        progress_frame.pack_forget()
+        if event.kind == 'done':
+            on_done(event.value)
+        elif event.kind == 'cancelled':
+            messagebox.showinfo("Annullato", "Elaborazione annullata. Le modifiche già inviate restano nel documento.")
+        else:
+            print(event.value)
+            messagebox.showerror("Errore", f"Si è verificato un errore: {event.value}")
+
+    def show_progress(event: JobEvent) -> None:
+        """Update the progress label and bar with a progress event."""
+        progress_label.config(text=PHASE_LABELS.get(event.phase, "Elaborazione in corso...").format(current=event.current, total=event.total))
+        if event.total:
+            progress_bar.stop()
+            progress_bar.config(mode="determinate", maximum=event.total, value=event.current)
+        elif str(progress_bar.cget("mode")) != "indeterminate":
+            progress_bar.config(mode="indeterminate")
+            progress_bar.start()
+
+    def cancel_job() -> None:
+        """Ask the running job to stop at the next safe point."""
+        if current_job:
+            current_job[0].cancel()
+            cancel_button.state(["disabled"])
+            progress_label.config(text="Annullamento in corso...")
 
     # GUI components
     tk.Label(root, text="Nannix presents...", font=("Helvetica", 8), **style_options).pack()
@@ -158,13 +366,20 @@ def create_gui(service: object, favorites: Dict[str, str], version: str) -> None
     main_frame = tk.Frame(root, bg=dark_bg)
     main_frame.pack(fill="both", expand=True, padx=10, pady=10)
 
-    main_frame.grid_rowconfigure(0, weight=1)
-    main_frame.grid_rowconfigure(1, weight=0)
-    main_frame.grid_rowconfigure(2, weight=1)
+    main_frame.grid_rowconfigure(0, weight=0)
+    main_frame.grid_rowconfigure(1, weight=1)
+    main_frame.grid_rowconfigure(2, weight=0)
+    main_frame.grid_rowconfigure(3, weight=1)
     main_frame.grid_columnconfigure(0, weight=1)
 
+    search_var = tk.StringVar()
+    search_frame = tk.Frame(main_frame, bg=dark_bg)
+    search_frame.grid(row=0, column=0, padx=10, pady=(5, 0), sticky="ew")
+    tk.Label(search_frame, text="Cerca:", bg=dark_bg, fg=dark_fg).pack(side="left")
+    tk.Entry(search_frame, textvariable=search_var, bg=dark_bg, fg=dark_fg, insertbackground=dark_fg).pack(side="left", fill="x", expand=True, padx=(5, 0))
+
     favorites_listbox = tk.Listbox(main_frame, height=15, width=40, bg=dark_bg, fg=dark_fg, selectbackground=accent_color, selectforeground=dark_bg)
-    favorites_listbox.grid(row=0, column=0, rowspan=3, padx=10, pady=5, sticky="ns")
+    favorites_listbox.grid(row=1, column=0, rowspan=3, padx=10, pady=5, sticky="ns")
 
     favorites_listbox.bind("<Button-1>", on_drag_start)
     favorites_listbox.bind("<B1-Motion>", on_drag_motion)
@@ -174,12 +389,12 @@ def create_gui(service: object, favorites: Dict[str, str], version: str) -> None
     favorites_listbox.bind("<FocusIn>", restore_selection)
 
     button_frame = tk.Frame(main_frame, bg=dark_bg)
-    button_frame.grid(row=1, column=1, padx=10, pady=5)
+    button_frame.grid(row=2, column=1, padx=10, pady=5)
 
-    ttk.Button(button_frame, text="+ Aggiungi Preferito", command=lambda: add_favorite(favorites, lambda: update_favorites_list(favorites, favorites_listbox)), style="Accent.TButton").pack(pady=5, fill="x")
-    ttk.Button(button_frame, text="- Rimuovi Preferito", command=lambda: remove_favorite(favorites, favorites_listbox, lambda: update_favorites_list(favorites, favorites_listbox)), style="Accent.TButton").pack(pady=5, fill="x")
-    ttk.Button(button_frame, text="* Modifica Preferito", command=lambda: edit_favorite(favorites, favorites_listbox, lambda: update_favorites_list(favorites, favorites_listbox)), style="Accent.TButton").pack(pady=5, fill="x")
-    ttk.Button(button_frame, text="! Importa da Bolder 1", command=lambda: import_favorite(favorites, lambda: update_favorites_list(favorites, favorites_listbox)), style="Accent.TButton").pack(pady=5, fill="x")
+    ttk.Button(button_frame, text="+ Aggiungi Preferito", command=lambda: add_favorite(favorites), style="Accent.TButton").pack(pady=5, fill="x")
+    ttk.Button(button_frame, text="- Rimuovi Preferito", command=lambda: remove_favorite(favorites, favorites_view), style="Accent.TButton").pack(pady=5, fill="x")
+    ttk.Button(button_frame, text="* Modifica Preferito", command=lambda: edit_favorite(favorites, favorites_view), style="Accent.TButton").pack(pady=5, fill="x")
+    ttk.Button(button_frame, text="! Importa da Bolder 1", command=lambda: import_favorite(favorites, service_pool), style="Accent.TButton").pack(pady=5, fill="x")
 
     selected_document_label = tk.Label(root, textvariable=selected_document_name, font=("Helvetica", 10), fg=dark_fg, bg=dark_bg)
     selected_document_label.pack(pady=5)
@@ -190,8 +405,20 @@ def create_gui(service: object, favorites: Dict[str, str], version: str) -> None
 
     text_box.bind("<FocusIn>", restore_selection)
 
+    def update_match_preview(event: tk.Event = None) -> None:
+        """Recount the matches of the words in the preview, once the user stops typing."""
+        match_preview.set_words(text_box.get("1.0", tk.END).strip().split(','), ignore_case_var.get())
+
+    text_box.bind("<KeyRelease>", update_match_preview)
+
     ignore_case_var = tk.BooleanVar()
-    tk.Checkbutton(root, text="Ignora Maiuscole/Minuscole", variable=ignore_case_var, bg=dark_bg, fg=dark_fg, selectcolor=dark_bg).pack()
+    tk.Checkbutton(root, text="Ignora Maiuscole/Minuscole", variable=ignore_case_var, command=update_match_preview, bg=dark_bg, fg=dark_fg, selectcolor=dark_bg).pack()
+
+    match_preview = MatchPreviewPanel(root, service_pool)
+    match_preview.frame.pack(pady=5)
+
+    overwrite_var = tk.BooleanVar()
+    tk.Checkbutton(root, text="Rimuovi formattazione non selezionata", variable=overwrite_var, bg=dark_bg, fg=dark_fg, selectcolor=dark_bg).pack()
 
     checkbox_frame = tk.Frame(root, bg=dark_bg)
     checkbox_frame.pack()
@@ -211,9 +438,54 @@ def create_gui(service: object, favorites: Dict[str, str], version: str) -> None
     tk.Checkbutton(checkbox_frame, text="Sottolineato", variable=underline_var, font=underline_font, bg=dark_bg, fg=dark_fg, selectcolor=dark_bg).grid(row=1, column=0, pady=2, sticky="w")
     tk.Checkbutton(checkbox_frame, text="Barrato", variable=strikethrough_var, font=strikethrough_font, bg=dark_bg, fg=dark_fg, selectcolor=dark_bg).grid(row=1, column=1, pady=2, sticky="w")
 
-    spinner_label = tk.Label(root, text="", fg=dark_fg, bg=dark_bg)
+    # Progress of the running job, shown only while it runs
+    current_job: List[Job] = []
+    progress_frame = tk.Frame(root, bg=dark_bg)
+    progress_label = tk.Label(progress_frame, text="", fg="white", bg=dark_bg)
+    progress_label.pack()
+    progress_bar = ttk.Progressbar(progress_frame, length=250)
+    progress_bar.pack(pady=2)
+    cancel_button = ttk.Button(progress_frame, text="Annulla", command=cancel_job, style="Accent.TButton")
+    cancel_button.pack(pady=2)
 
     ttk.Button(root, text="Applica", command=process_text, style="Accent.TButton").pack()
+    ttk.Button(root, text="Applica a più documenti", command=process_multiple, style="Accent.TButton").pack(pady=5)
+    ttk.Button(root, text="Annulla ultima formattazione", command=process_undo, style="Accent.TButton").pack()
 
-    update_favorites_list(favorites, favorites_listbox)
+    # Watch mode: keeps the selected document formatted while others edit it
+    watch_job: List[Job] = []
+    watch_button = ttk.Button(root, text="Sorveglia documento", command=toggle_watch, style="Accent.TButton")
+    watch_button.pack(pady=5)
+    watch_label = tk.Label(root, text="", fg=dark_fg, bg=dark_bg, wraplength=350)
+    watch_label.pack()
+
+    def poll_background_tasks(pending: set) -> None:
+        """Handle the startup tasks running in the background once they complete, on the Tk main thread.
+
+        Args:
+            pending (set): The names of the tasks not handled yet.
+        """
+        if "update_check" in pending and latest_release.done():
+            pending.discard("update_check")
+            if latest_release.exception():
+                print(f"Impossibile verificare gli aggiornamenti: {latest_release.exception()}")
+            else:
+                prompt_update(latest_release.result(), version)
+
+        if "auth" in pending and service_pool.done():
+            pending.discard("auth")
+            if service_pool.exception():
+                messagebox.showerror("Errore", f"Autenticazione con Google non riuscita: {service_pool.exception()}")
+
+        if pending:
+            root.after(100, poll_background_tasks, pending)
+        elif startup_timer:
+            print(startup_timer.report())
+            log_metrics('startup', steps=startup_timer.durations(), api=api_stats.snapshot())
+
+    favorites_view = FavoritesListView(favorites, favorites_listbox)
+    search_var.trace_add("write", lambda *args: favorites_view.set_query(search_var.get()))
+    if startup_timer:
+        root.after_idle(startup_timer.mark, "window")
+    poll_background_tasks({"auth", "update_check"} if latest_release else {"auth"})
     root.mainloop()
@@ -0,0 +1,213 @@
+import os
+import json
+import zlib
+import base64
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+from functions.text_index import ParagraphIndex, Segment, index_by_segment, overlapping_paragraphs, range_segment, make_range
+
+UNDO_DIR = "undo_history"
+MAX_UNDO_LEVELS = 50
+
+# Fields whose original value is recorded, in the order of their bits in the style codes
+UNDO_FIELDS = ('bold', 'italic', 'underline', 'strikethrough')
+
+# State of a field in a style code: not set on the text (inherited), explicitly False or True
+UNSET, FALSE, TRUE = range(3)
+
+class UndoError(Exception):
+    """Raised when the last formatting of a document cannot be undone."""
+
+def _style_code(style: Dict[str, Any]) -> int:
+    """Pack the state of the UNDO_FIELDS of a text style in a small integer, two bits per field."""
+    code = 0
+    for bit, field in enumerate(UNDO_FIELDS):
+        value = style.get(field)
+        code |= (UNSET if value is None else TRUE if value else FALSE) << (2 * bit)
+    return code
+
+def _code_style(code: int, fields: List[str]) -> Dict[str, bool]:
+    """Unpack a style code into a text style; unset fields are left out, so the API resets them."""
+    style = {}
+    for bit, field in enumerate(UNDO_FIELDS):
+        state = (code >> (2 * bit)) & 3
+        if field in fields and state != UNSET:
+            style[field] = state == TRUE
+    return style
+
+def capture_styles(paragraphs: List[ParagraphIndex], batches: List[List[Dict[str, Any]]]) -> Dict[Segment, List[Tuple[int, int, int]]]:
+    """
+    Record the original style of every range the batches are about to change.
+
+    Args:
+        paragraphs (List[ParagraphIndex]): The text index of the document before the update.
+        batches (List[List[Dict[str, Any]]]): The updateTextStyle requests to be sent.
+
+    Returns:
+        Dict[Segment, List[Tuple[int, int, int]]]: For each segment, sorted (start, end, style
+        code) runs; adjacent runs with the same style are merged.
+    """
+    lookup = index_by_segment(paragraphs)
+    pieces_by_segment: Dict[Segment, List[Tuple[int, int, int]]] = {}
+    for batch in batches:
+        for request in batch:
+            document_range = request['updateTextStyle']['range']
+            segment = range_segment(document_range)
+            pieces = pieces_by_segment.setdefault(segment, [])
+            for position in overlapping_paragraphs(lookup, segment, document_range['startIndex'], document_range['endIndex']):
+                for piece_start, piece_end, style in paragraphs[position].styles_between(document_range['startIndex'], document_range['endIndex']):
+                    pieces.append((piece_start, piece_end, _style_code(style)))
+
+    runs_by_segment = {}
+    for segment, pieces in pieces_by_segment.items():
+        runs: List[Tuple[int, int, int]] = []
+        for start, end, code in sorted(pieces):
+            if runs and start <= runs[-1][1] and code == runs[-1][2]:
+                runs[-1] = (runs[-1][0], max(end, runs[-1][1]), code)
+            elif runs and start < runs[-1][1]:
+                # Overlapping requests see the same original style, so only the uncovered tail is new
+                if end > runs[-1][1]:
+                    runs.append((runs[-1][1], end, code))
+            else:
+                runs.append((start, end, code))
+        if runs:
+            runs_by_segment[segment] = runs
+    return runs_by_segment
+
+def encode_runs(runs: List[Tuple[int, int, int]]) -> str:
+    """
+    Encode the runs compactly: gaps and lengths instead of absolute indexes, deflated and in base64.
+
+    Consecutive runs produce small, repetitive numbers, so a snapshot of thousands of ranges
+    takes a few bytes per range.
+    """
+    flat = []
+    previous_end = 0
+    for start, end, code in runs:
+        flat.extend((start - previous_end, end - start, code))
+        previous_end = end
+    return base64.b64encode(zlib.compress(json.dumps(flat, separators=(',', ':')).encode(), 9)).decode('ascii')
+
+def decode_runs(data: str) -> List[Tuple[int, int, int]]:
+    """Decode the runs written by `encode_runs`."""
+    flat = json.loads(zlib.decompress(base64.b64decode(data)))
+    runs = []
+    previous_end = 0
+    for position in range(0, len(flat), 3):
+        gap, length, code = flat[position:position + 3]
+        start = previous_end + gap
+        runs.append((start, start + length, code))
+        previous_end = start + length
+    return runs
+
+def decode_level(level: Dict[str, Any]) -> Dict[Segment, List[Tuple[int, int, int]]]:
+    """Decode the runs of every segment of an undo level."""
+    return {(tab_id, segment_id): decode_runs(data) for tab_id, segment_id, data in level['segments']}
+
+def inverse_requests(runs_by_segment: Dict[Segment, List[Tuple[int, int, int]]], fields: List[str]) -> List[Dict[str, Any]]:
+    """Build the updateTextStyle requests restoring the recorded styles of the given fields."""
+    return [
+        {
+            'updateTextStyle': {
+                'range': make_range(start, end, segment),
+                'textStyle': _code_style(code, fields),
+                'fields': ','.join(fields)
+            }
+        }
+        for segment, runs in runs_by_segment.items()
+        for start, end, code in runs
+    ]
+
+class UndoHistory:
+    """
+    Per-document stacks of the original styles of the last formatting runs, stored on disk.
+
+    Each level holds the revision the run started from, the revision it left the document
+    at, the fields it changed and the encoded runs of the original styles of each segment.
+    """
+
+    def __init__(self, directory: str = UNDO_DIR, max_levels: int = MAX_UNDO_LEVELS) -> None:
+        self.directory = directory
+        self.max_levels = max_levels
+        self._lock = threading.Lock()
+
+    def _path(self, document_id: str) -> str:
+        """Return the path of the history file of a document."""
+        return os.path.join(self.directory, f"{document_id}.json")
+
+    def _load(self, document_id: str) -> List[Dict[str, Any]]:
+        """Load the levels of a document, oldest first."""
+        try:
+            with open(self._path(document_id), 'r', encoding='utf-8') as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return []
+
+    def _save(self, document_id: str, levels: List[Dict[str, Any]]) -> None:
+        """Write the levels of a document through a temporary file."""
+        try:
+            if not levels:
+                if os.path.exists(self._path(document_id)):
+                    os.remove(self._path(document_id))
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            temp_path = self._path(document_id) + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as file:
+                json.dump(levels, file, separators=(',', ':'))
+            os.replace(temp_path, self._path(document_id))
+        except OSError as e:
+            print(f"Impossibile salvare la cronologia delle modifiche: {e}")
+
+    def record(self, document_id: str, previous_revision_id: Optional[str], revision_id: Optional[str], fields: List[str], runs_by_segment: Dict[Segment, List[Tuple[int, int, int]]]) -> None:
+        """
+        Push a new level for a formatting run, dropping the oldest ones beyond `max_levels`.
+
+        Args:
+            document_id (str): The ID of the Google Document.
+            previous_revision_id (Optional[str]): The revision before the run.
+            revision_id (Optional[str]): The revision after the run; without it the run cannot be undone.
+            fields (List[str]): The style fields changed by the run.
+            runs_by_segment (Dict[Segment, List[Tuple[int, int, int]]]): The original styles, from `capture_styles`.
+        """
+        if not revision_id or not runs_by_segment:
+            return
+        segments = [[tab_id, segment_id, encode_runs(runs)] for (tab_id, segment_id), runs in runs_by_segment.items()]
+        with self._lock:
+            levels = self._load(document_id)
+            levels.append({'before': previous_revision_id, 'after': revision_id, 'fields': fields, 'segments': segments})
+            self._save(document_id, levels[-self.max_levels:])
+
+    def peek(self, document_id: str) -> Optional[Dict[str, Any]]:
+        """Return the last level of a document, or None if there is nothing to undo."""
+        with self._lock:
+            levels = self._load(document_id)
+        return levels[-1] if levels else None
+
+    def count(self, document_id: str) -> int:
+        """Return the number of levels recorded for a document."""
+        with self._lock:
+            return len(self._load(document_id))
+
+    def pop(self, document_id: str, revision_id: Optional[str]) -> None:
+        """
+        Drop the last level after it was undone, leaving the document at `revision_id`.
+
+        The previous level ended at the revision the undone run started from, which is now
+        replaced by the revision of the undo, so it can be undone in turn.
+        """
+        with self._lock:
+            levels = self._load(document_id)
+            if not levels:
+                return
+            undone = levels.pop()
+            if levels and revision_id and levels[-1]['after'] == undone['before']:
+                levels[-1]['after'] = revision_id
+            self._save(document_id, levels)
+
+    def discard(self, document_id: str) -> None:
+        """Drop all the levels of a document, e.g. once it was edited elsewhere."""
+        with self._lock:
+            self._save(document_id, [])
+
+# History shared by all the formatting runs of the application
+undo_history = UndoHistory()
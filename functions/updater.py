@@ -1,23 +1,81 @@
-import requests
+import os
+import json
 from tkinter import messagebox
 import platform
 import webbrowser
 import sys
+from typing import Any, Dict, Optional
+
+UPDATE_CACHE_FILE = "update_cache.json"
+REQUEST_TIMEOUT = 5  # Seconds, so a slow or unreachable GitHub never delays the program
+
+def load_update_cache() -> Dict[str, Any]:
+    """Load the result of the last update check from the JSON file."""
+    if os.path.exists(UPDATE_CACHE_FILE):
+        try:
+            with open(UPDATE_CACHE_FILE, 'r') as file:
+                return json.load(file)
+        except (OSError, ValueError) as e:
+            print(f"Impossibile leggere la cache degli aggiornamenti: {e}")
+    return {}
+
+def save_update_cache(cache: Dict[str, Any]) -> None:
+    """Save the result of the update check to the JSON file."""
+    try:
+        with open(UPDATE_CACHE_FILE, 'w') as file:
+            json.dump(cache, file)
+    except OSError as e:
+        print(f"Impossibile salvare la cache degli aggiornamenti: {e}")
+
+def get_latest_release(repo: str) -> Optional[Dict[str, Any]]:
+    """
+    Fetch the latest release information from the GitHub API.
+
+    Only the newest release is requested, with the ETag of the previous answer: if nothing
+    changed GitHub replies 304 with an empty body and the cached release is used. The cached
+    release is also used when GitHub cannot be reached.
+    """
+    import requests  # Imported here: slow to load and not needed to show the window
 
-def get_latest_release(repo: str):
-    """Fetch the latest release information from the GitHub API."""
     url = f'https://api.github.com/repos/{repo}/releases'
     headers = {
         "Accept": "application/vnd.github.v3+json"
     }
-    response = requests.get(url, headers=headers)
-    response.raise_for_status()
+    cache = load_update_cache()
+    if cache.get('repo') != repo:
+        cache = {}
+    if cache.get('etag'):
+        headers["If-None-Match"] = cache['etag']
+
+    try:
+        response = requests.get(url, headers=headers, params={'per_page': 1}, timeout=REQUEST_TIMEOUT)
+        if response.status_code == 304:
+            return cache.get('release')
+        response.raise_for_status()
+    except requests.RequestException as e:
+        if 'release' not in cache:
+            raise
+        print(f"Impossibile contattare GitHub, uso l'ultimo risultato salvato: {e}")
+        return cache['release']
+
     releases = response.json()
-    return releases[0] if releases else None
+    release = None
+    if releases:
+        # Only keep the fields used to prompt the update
+        release = {
+            'name': releases[0]['name'],
+            'body': releases[0].get('body') or '',
+            'assets': [{'name': asset['name'], 'browser_download_url': asset['browser_download_url']} for asset in releases[0].get('assets', [])]
+        }
+    save_update_cache({'repo': repo, 'etag': response.headers.get('ETag'), 'release': release})
+    return release
 
 def check_for_updates(current_version: str, repo: str) -> None:
     """Check for updates and download the new release if available."""
-    release = get_latest_release(repo)
+    prompt_update(get_latest_release(repo), current_version)
+
+def prompt_update(release: Optional[Dict[str, Any]], current_version: str) -> None:
+    """Ask the user to download the release if it is newer than the current version. Must run on the Tk main thread."""
     if release:
         latest_version = release['name']
         if latest_version != current_version:
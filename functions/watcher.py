@@ -0,0 +1,95 @@
+import json
+import hashlib
+from typing import Any, Dict, List, NamedTuple, Optional, Set
+from functions.text_index import ParagraphIndex
+from functions.doc_cache import CachedDocument
+from functions.google_docs import toggle_formatting, fetch_revision_id
+
+# Seconds between two checks of a watched document
+WATCH_INTERVAL = 30
+
+class WatchResult(NamedTuple):
+    """The outcome of a check of a watched document that had changed."""
+    revision_id: Optional[str]  # The revision that was searched; later edits are left to the next check
+    scanned_paragraphs: int  # The paragraphs new or changed since the previous check
+    total_paragraphs: int  # All the paragraphs of the document
+    changes_count: int  # The matches whose formatting was changed
+
+def paragraph_hash(paragraph: ParagraphIndex) -> bytes:
+    """
+    Hash the content of a paragraph: its segment, text, run boundaries and run styles.
+
+    The Docs indexes are left out, so a paragraph only shifted by edits above it keeps its hash.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update('\x00'.join(paragraph.segment).encode('utf-8'))
+    digest.update(paragraph.text.encode('utf-8', 'surrogatepass'))
+    digest.update(paragraph.offsets.tobytes())
+    digest.update(json.dumps(paragraph.styles, sort_keys=True).encode('utf-8'))
+    return digest.digest()
+
+class DocumentWatcher:
+    """
+    Keeps the formatting of a document up to date while other people edit it.
+
+    Each check costs a single revisionId lookup while the document does not change. When it
+    changes, the document is downloaded (the API cannot return only a part of it) and only
+    the paragraphs whose hash is not among the ones left by the previous check are searched
+    and formatted. Paragraphs identical to an already processed one need no update, so the
+    hashes are kept as a set. The updates let the server merge the edits made while they
+    are computed, since a busy document rarely stays still between the read and the write.
+    """
+
+    def __init__(
+        self,
+        document_id: str,  # The ID of the Google Document
+        words: List[str],  # A list of words to format
+        formatting_options: Dict[str, bool],  # Formatting options (e.g., {'bold': True, 'italic': False})
+        ignore_case: bool = False,  # Whether to ignore case when matching words
+        diff: bool = True  # Whether to only send the styles that would actually change
+    ) -> None:
+        self.document_id = document_id
+        self.words = words
+        self.formatting_options = formatting_options
+        self.ignore_case = ignore_case
+        self.diff = diff
+        self.revision_id: Optional[str] = None
+        self.hashes: Set[bytes] = set()
+
+    def check(self, service: Any) -> Optional[WatchResult]:
+        """
+        Format the paragraphs changed since the previous check, if the document changed.
+
+        Args:
+            service (Any): The Google Docs API service object.
+
+        Returns:
+            Optional[WatchResult]: The outcome of the check, or None if the document did not change.
+        """
+        if self.revision_id is not None and fetch_revision_id(service, self.document_id) == self.revision_id:
+            return None
+
+        scanned = []
+        snapshots = []
+        def is_changed(paragraph: ParagraphIndex) -> bool:
+            if paragraph_hash(paragraph) in self.hashes:
+                return False
+            scanned.append(paragraph)
+            return True
+
+        def on_fetched(entry: CachedDocument) -> None:
+            scanned.clear()  # The run is starting over on a fresh copy of the document
+            snapshots.append(entry)
+
+        changes_count = toggle_formatting(
+            service, self.document_id, self.words, self.formatting_options, self.ignore_case, self.diff,
+            paragraph_filter=is_changed, merge_edits=True, on_fetched=on_fetched
+        )
+
+        # Remember the copy that was searched, not a newer one: the edits others made after it
+        # must be searched by the next check. Our own updates make the paragraphs they touched
+        # look changed, so the next check searches them once more, finding nothing to do.
+        entry = snapshots[-1]
+        self.hashes = {paragraph_hash(paragraph) for paragraph in entry.paragraphs}
+        self.revision_id = entry.revision_id
+        return WatchResult(entry.revision_id, len(scanned), len(entry.paragraphs), changes_count)
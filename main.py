@@ -1,26 +1,51 @@
+from utils.timing import StartupTimer
+startup_timer = StartupTimer()  # Created before the other imports, so they are measured too
+
+import threading
+import multiprocessing
+from concurrent.futures import Future
 from functions.ui import create_gui
-from functions.favorites import load_favorites
-from functions.auth import authenticate_google, check_env
-from functions.updater import check_for_updates
+from functions.favorites_store import load_favorites
+from functions.auth import get_credentials, check_env
+from functions.service_pool import ServicePool
+from functions.updater import get_latest_release
 
 VERSION_NAME = "__VERSION_NAME__" # Placeholder for the version name, replaced in pipeline
 GITHUB_REPO = "Relakiin/BolderPlus"
 # This script is the main entry point for the BolderPlus application.
 
+def run_in_background(function, *args) -> Future:
+    """Run a function in a daemon thread, so it never keeps the program alive, and return its future."""
+    future = Future()
+    def run() -> None:
+        try:
+            future.set_result(function(*args))
+        except BaseException as error:
+            future.set_exception(error)
+    threading.Thread(target=run, daemon=True).start()
+    return future
+
 def bootstrap():
-    """Bootstrap the application by checking for updates, authenticating, and launching the GUI."""
+    """Bootstrap the application: show the GUI right away while authenticating and checking for updates in the background."""
+    startup_timer.mark("imports")
     check_env(current_version=VERSION_NAME)
+    startup_timer.mark("env")
 
-    check_for_updates(current_version=VERSION_NAME, repo=GITHUB_REPO)
-
-    # Authenticate with Google
-    service = authenticate_google()
+    # Authenticate with Google and check for updates in parallel, without blocking the window
+    service_pool = run_in_background(lambda: ServicePool(get_credentials()))
+    latest_release = run_in_background(get_latest_release, GITHUB_REPO)
+    service_pool.add_done_callback(lambda future: startup_timer.mark("auth"))
+    latest_release.add_done_callback(lambda future: startup_timer.mark("update_check"))
 
     # Load favorites
     favorites = load_favorites()
+    startup_timer.mark("favorites")
 
     # Launch the GUI
-    create_gui(service, favorites, version=VERSION_NAME)
+    create_gui(service_pool, favorites, version=VERSION_NAME, latest_release=latest_release, startup_timer=startup_timer)
 
 if __name__ == "__main__":
+    # In the frozen executable, a worker process of the parallel matching runs the executable
+    # itself: this makes it run the worker instead of opening another window
+    multiprocessing.freeze_support()
     bootstrap()
@@ -0,0 +1,47 @@
+import json
+from benchmarks.synthetic_docs import FakeDocsHttp
+
+class CollaborativeHttp(FakeDocsHttp):
+    """A fake Docs transport where someone else edits the document around our writes."""
+
+    def __init__(self, documents, edits_before_write=0, malformed=False, after_write=None):
+        super().__init__(documents)
+        self.edits_before_write = edits_before_write  # How many of our writes meet a concurrent edit
+        self.malformed = malformed  # Whether every write is rejected as an invalid request
+        self.after_write = after_write  # Called with the document ID right after each of our writes
+        self.fetches = 0
+        self.write_controls = []
+
+    def request(self, uri, method='GET', body=None, headers=None, **kwargs):
+        import httplib2
+        document_id = uri.split('?')[0].rsplit('/', 1)[-1].partition(':')[0]
+        if method == 'POST' and uri.split('?')[0].endswith(':batchUpdate'):
+            document = self.documents[document_id]
+            write_control = json.loads(body).get('writeControl', {})
+            self.write_controls.append(write_control)
+            if self.edits_before_write:
+                self.edits_before_write -= 1
+                self.edit(document_id)
+            if self.malformed or write_control.get('requiredRevisionId', document['revisionId']) != document['revisionId']:
+                return httplib2.Response({'status': 400}), b'{"error": {"code": 400, "message": "Bad request"}}'
+            response = super().request(uri, method, body, headers, **kwargs)
+            if self.after_write:
+                self.after_write(document_id)
+            return response
+        if 'fields=revisionId' not in uri:
+            self.fetches += 1
+        return super().request(uri, method, body, headers, **kwargs)
+
+    def edit(self, document_id, change=None):
+        """Make an edit of someone else: apply `change` to the document and move to a new revision."""
+        if change:
+            change(self.documents[document_id])
+        self._revisions[document_id] += 1
+        self.documents[document_id]['revisionId'] = f"rev-{self._revisions[document_id]}"
+
+def fake_service(http):
+    from googleapiclient.discovery import build_from_document
+    from functions.service_pool import _discovery_document, reuse_resources
+    for document_id, document in http.documents.items():
+        document['documentId'] = document_id
+    return reuse_resources(build_from_document(_discovery_document(), http=http))
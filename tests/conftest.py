@@ -0,0 +1,19 @@
+import os
+import sys
+import pytest
+
+# The modules are imported from the root of the repository, as main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def offline_api(monkeypatch, tmp_path):
+    """Lift the API quotas and keep the undo history and the metrics log out of the working directory."""
+    from functions import api_client, google_docs
+    from functions.api_client import TokenBucket
+    from functions.undo_history import UndoHistory
+    from utils import metrics
+
+    monkeypatch.setattr(api_client, 'read_limiter', TokenBucket(1e9, 10**9))
+    monkeypatch.setattr(api_client, 'write_limiter', TokenBucket(1e9, 10**9))
+    monkeypatch.setattr(google_docs, 'undo_history', UndoHistory(str(tmp_path / 'undo')))
+    monkeypatch.setattr(metrics, 'METRICS_ENABLED', False)
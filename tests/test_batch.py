@@ -0,0 +1,39 @@
+import pytest
+from contextlib import contextmanager
+from functions.batch import apply_to_documents
+from functions.doc_cache import document_cache
+from functions.jobs import JobCancelled
+from benchmarks.synthetic_docs import make_document, make_vocabulary
+from collaborative_http import CollaborativeHttp, fake_service
+
+class SingleServicePool:
+    """Stands in for ServicePool, handing out one fake service."""
+
+    def __init__(self, service):
+        self.service = service
+
+    @contextmanager
+    def lease(self):
+        yield self.service
+
+def test_cancellation_stops_the_run(offline_api):
+    vocabulary = make_vocabulary(200)
+    documents = {f'doc{number}': make_document(10, vocabulary=vocabulary, seed=number) for number in range(5)}
+    for document_id in documents:
+        document_cache.invalidate(document_id)
+    http = CollaborativeHttp(documents)
+    results = []
+
+    fetched = []
+    def cancel_after_first_document(phase, current, total):
+        if phase == 'fetch':
+            fetched.append(phase)
+            if len(fetched) > 1:
+                raise JobCancelled("Operazione annullata")
+
+    with pytest.raises(JobCancelled):
+        apply_to_documents(
+            SingleServicePool(fake_service(http)), [(document_id, document_id) for document_id in documents],
+            vocabulary[:20], {'bold': True}, max_workers=1, on_result=results.append, on_progress=cancel_after_first_document
+        )
+    assert [result.error for result in results] == [None]  # No document reported as failed
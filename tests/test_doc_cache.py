@@ -0,0 +1,55 @@
+from functions.doc_cache import CachedDocument, DocumentCache
+from functions.google_docs import find_style_updates
+from functions.matcher import WordMatcher
+from functions.request_planner import plan_batches
+from functions.text_index import index_paragraph, make_range
+
+STYLE = {'bold': True, 'italic': False, 'underline': False, 'strikethrough': False}
+
+def make_entry():
+    paragraph = {'elements': [
+        {'startIndex': 1, 'endIndex': 12, 'textRun': {'content': 'Roma e Mila', 'textStyle': {}}},
+        {'startIndex': 12, 'endIndex': 16, 'textRun': {'content': 'no.\n', 'textStyle': {'italic': True}}},
+    ]}
+    return CachedDocument('r1', [index_paragraph(paragraph)])
+
+def bold_request(start_index, end_index):
+    return {'updateTextStyle': {'range': make_range(start_index, end_index), 'textStyle': {'bold': True}, 'fields': 'bold'}}
+
+def test_apply_updates_splits_the_runs_and_moves_to_the_new_revision():
+    cache = DocumentCache()
+    entry = make_entry()
+    cache.put('doc', entry)
+
+    cache.apply_updates('doc', 'r1', 'r2', [bold_request(1, 5), bold_request(8, 15)])
+
+    updated = cache.get('doc', 'r2')
+    assert cache.get('doc', 'r1') is None
+    assert list(updated.paragraphs[0].start_indexes) == [1, 5, 8, 12, 15]
+    assert updated.paragraphs[0].styles == [{'bold': True}, {}, {'bold': True}, {'italic': True, 'bold': True}, {'italic': True}]
+    # Copy on write: a caller holding the old entry still sees the old styles
+    assert entry.paragraphs[0].styles == [{}, {'italic': True}]
+
+def test_a_second_diff_run_on_the_updated_entry_changes_nothing():
+    cache = DocumentCache()
+    cache.put('doc', make_entry())
+    matcher = WordMatcher(['Roma', 'Milano'])
+
+    ranges, changes_count = find_style_updates(cache.get('doc').paragraphs, matcher, STYLE)
+    assert changes_count == 2
+    cache.apply_updates('doc', 'r1', 'r2', [request for batch in plan_batches(ranges, STYLE).batches for request in batch])
+
+    ranges, changes_count = find_style_updates(cache.get('doc', 'r2').paragraphs, matcher, STYLE)
+    assert (ranges, changes_count) == ({}, 0)
+
+def test_apply_updates_drops_the_entry_without_a_new_revision():
+    cache = DocumentCache()
+    cache.put('doc', make_entry())
+    cache.apply_updates('doc', 'r1', None, [bold_request(1, 5)])
+    assert cache.get('doc') is None
+
+def test_apply_updates_ignores_another_revision():
+    cache = DocumentCache()
+    cache.put('doc', make_entry())
+    cache.apply_updates('doc', 'r0', 'r2', [bold_request(1, 5)])
+    assert cache.get('doc', 'r1').paragraphs[0].styles == [{}, {'italic': True}]
@@ -0,0 +1,46 @@
+import random
+from typing import List, Tuple
+import pytest
+from functions.matcher import WordMatcher, _normalize_words, _is_whole_word
+
+def find_ranges_naive(text: str, words: List[str], ignore_case: bool = False) -> List[Tuple[int, int]]:
+    """The scan `toggle_formatting` used before the automaton: one `str.find` loop per word."""
+    normalized_text = text.lower() if ignore_case else text
+    ranges = []
+    for normalized_word in _normalize_words(words, ignore_case):
+        start_index = 0
+        while True:
+            start_index = normalized_text.find(normalized_word, start_index)
+            if start_index == -1:
+                break
+            end_index = start_index + len(normalized_word)
+            if _is_whole_word(normalized_text, start_index, end_index):
+                ranges.append((start_index, end_index))
+            start_index = end_index
+    ranges.sort()
+    return ranges
+
+# A small alphabet, so words overlap, share prefixes and repeat often
+ALPHABET = 'abAB àÀ.,\n1'
+
+def random_text(rng: random.Random, length: int) -> str:
+    return ''.join(rng.choice(ALPHABET) for _ in range(length))
+
+@pytest.mark.parametrize('ignore_case', [False, True])
+def test_matches_naive_scan_on_random_inputs(ignore_case):
+    rng = random.Random(1234)
+    for _ in range(3000):
+        words = [random_text(rng, rng.randint(0, 4)) for _ in range(rng.randint(0, 6))]
+        text = random_text(rng, rng.randint(0, 60))
+        assert WordMatcher(words, ignore_case).find_ranges(text) == find_ranges_naive(text, words, ignore_case), (words, text)
+
+def test_overlapping_occurrences_of_the_same_word():
+    assert WordMatcher(['aa']).find_ranges('aaa aa') == find_ranges_naive('aaa aa', ['aa']) == [(4, 6)]
+
+def test_count_words_agrees_with_find_ranges():
+    rng = random.Random(99)
+    texts = [random_text(rng, 40) for _ in range(50)]
+    words = ['a', 'ab', 'B', 'à']
+    matcher = WordMatcher(words)
+    counts = matcher.count_words(texts)
+    assert sum(counts.values()) == sum(len(matcher.find_ranges(text)) for text in texts)
@@ -0,0 +1,24 @@
+import random
+from functions import parallel_match
+from functions.matcher import WordMatcher
+from functions.parallel_match import match_paragraphs, split_chunks
+
+def test_split_chunks_keeps_every_text_in_order():
+    texts = ['x' * length for length in random.Random(3).choices(range(1, 200), k=500)]
+    chunks = split_chunks(texts, 16)
+    assert 1 < len(chunks) <= 17
+    assert [text for chunk in chunks for text in chunk] == texts
+
+def test_parallel_matches_equal_serial(monkeypatch):
+    rng = random.Random(7)
+    vocabulary = ['roma', 'Milano', 'via', 'ROMA', 'piazza', 'milano']
+    texts = [' '.join(rng.choice(vocabulary + ['e', 'di']) for _ in range(rng.randint(0, 30))) + '\n' for _ in range(400)]
+    matcher = WordMatcher(['roma', 'milano', 'via'], ignore_case=True)
+
+    monkeypatch.setattr(parallel_match, 'MAX_PROCESSES', 2)
+    parallel = match_paragraphs(matcher, texts, min_chars=0)
+    assert parallel_match._pool is not None  # The worker processes were used
+    parallel_match._reset_pool()
+    serial = match_paragraphs(matcher, texts, min_chars=10**12)
+
+    assert parallel == serial == [matcher.find_ranges(text) for text in texts]
@@ -0,0 +1,35 @@
+from functions.request_planner import coalesce_ranges, plan_batches
+from functions.text_index import BODY_SEGMENT
+
+HEADER = ('', 'kix.h1')
+
+def test_coalesce_merges_adjacent_and_overlapping_ranges():
+    assert coalesce_ranges([(20, 25), (1, 5), (5, 8), (7, 10), (12, 14), (13, 13)]) == [(1, 10), (12, 14), (20, 25)]
+
+def test_plan_coalesces_each_segment_and_mask_separately():
+    plan = plan_batches({
+        (BODY_SEGMENT, 'bold'): [(1, 5), (5, 9), (20, 24)],
+        (BODY_SEGMENT, 'bold,italic'): [(9, 12)],
+        (HEADER, 'bold'): [(1, 5), (3, 7)],
+    }, {'bold': True, 'italic': False})
+
+    requests = [request['updateTextStyle'] for request in plan.batches[0]]
+    assert len(plan.batches) == 1
+    assert (plan.requests_count, plan.saved_requests) == (4, 2)
+    assert [(update['range']['startIndex'], update['range']['endIndex'], update['fields']) for update in requests] == [
+        (1, 9, 'bold'), (20, 24, 'bold'), (9, 12, 'bold,italic'), (1, 7, 'bold')
+    ]
+    assert requests[2]['textStyle'] == {'bold': True, 'italic': False}
+    assert requests[3]['range']['segmentId'] == 'kix.h1'
+
+def test_plan_splits_at_the_request_limit():
+    plan = plan_batches({(BODY_SEGMENT, 'bold'): [(start, start + 2) for start in range(0, 70, 3)]}, {'bold': True}, max_requests=10)
+    assert [len(batch) for batch in plan.batches] == [10, 10, 4]
+    assert plan.saved_requests == 0
+
+def test_plan_splits_at_the_byte_limit():
+    ranges = [(start, start + 2) for start in range(10, 40, 3)]  # Two-digit indexes: every request has the same size
+    size = plan_batches({(BODY_SEGMENT, 'bold'): ranges}, {'bold': True}).payload_bytes // len(ranges)
+    plan = plan_batches({(BODY_SEGMENT, 'bold'): ranges}, {'bold': True}, max_bytes=3 * size + 2)
+    assert [len(batch) for batch in plan.batches] == [3, 3, 3, 1]
+    assert sum(len(batch) for batch in plan.batches) == plan.requests_count == 10
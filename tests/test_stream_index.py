@@ -0,0 +1,54 @@
+import io
+import json
+import pytest
+from functions import stream_index
+from functions.text_index import build_text_index
+from benchmarks.synthetic_docs import make_document
+
+if not stream_index.streaming_available():
+    pytest.skip('ijson is not installed', allow_module_level=True)
+
+def paragraph(start_index, text, style=None):
+    element = {'endIndex': start_index + len(text), 'textRun': {'content': text, 'textStyle': style or {}}}
+    if start_index:
+        element['startIndex'] = start_index  # Left out when 0, as the API does
+    return {'endIndex': start_index + len(text), 'paragraph': {'elements': [element]}}
+
+def cell_table(*contents):
+    return {'table': {'tableRows': [{'tableCells': [{'content': list(contents)}]}]}}
+
+def index_key(paragraphs):
+    return [(p.segment, p.text, list(p.offsets), list(p.start_indexes), p.styles) for p in paragraphs]
+
+def assert_same_index(doc):
+    revision_id, streamed = stream_index.stream_text_index(io.BytesIO(json.dumps(doc).encode('utf-8')))
+    assert revision_id == doc.get('revisionId')
+    assert index_key(streamed) == index_key(build_text_index(doc))
+
+def test_tabs_segments_and_tables():
+    # Keys deliberately out of the order iter_paragraphs visits them
+    parent = {
+        'childTabs': [{'documentTab': {'body': {'content': [paragraph(1, 'child\n')]}}, 'tabProperties': {'tabId': 't.1'}}],
+        'documentTab': {
+            'footnotes': {'f.1': {'content': [paragraph(0, ' nota\n')]}},
+            'headers': {'h.2': {'content': [paragraph(0, 'Verbale\n', {'bold': True})]}, 'h.1': {'content': [paragraph(0, 'Roma\n')]}},
+            'body': {'content': [paragraph(1, 'corpo\n'), cell_table(paragraph(10, 'cella\n'), cell_table(paragraph(20, 'interna\n')))]},
+        },
+        'tabProperties': {'tabId': 't.0'},
+    }
+    second = {'tabProperties': {'tabId': 't.2'}, 'documentTab': {'body': {'content': [
+        {'tableOfContents': {'content': [paragraph(1, 'indice\n')]}}, paragraph(10, 'secondo\n'), paragraph(30, ''),
+    ]}, 'footers': {'ft': {'content': [paragraph(0, 'piede\n')]}}}}
+    assert_same_index({'documentId': 'd', 'tabs': [parent, second], 'revisionId': 'r0'})
+
+def test_document_without_tabs():
+    assert_same_index({'revisionId': 'r1', 'body': {'content': [paragraph(1, 'testo\n')]}, 'headers': {'h': {'content': [paragraph(0, 'Verbale Roma\n')]}}})
+
+def test_header_first_run_without_start_index():
+    revision_id, streamed = stream_index.stream_text_index(io.BytesIO(json.dumps(
+        {'revisionId': 'r2', 'headers': {'kix.h1': {'content': [paragraph(0, 'Verbale\n')]}}}
+    ).encode('utf-8')))
+    assert [(p.segment, p.text, list(p.start_indexes)) for p in streamed] == [(('', 'kix.h1'), 'Verbale\n', [0])]
+
+def test_synthetic_document():
+    assert_same_index(make_document(200, runs_per_paragraph=5, table_every=7))
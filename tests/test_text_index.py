@@ -0,0 +1,23 @@
+from functions.text_index import build_text_index, index_paragraph
+
+def test_header_first_run_without_start_index():
+    # The API leaves out startIndex when it is 0, as on the first run of a header
+    paragraph = {'elements': [
+        {'endIndex': 7, 'textRun': {'content': 'Verbale', 'textStyle': {}}},
+        {'startIndex': 7, 'endIndex': 13, 'textRun': {'content': ' Roma\n', 'textStyle': {'bold': True}}},
+    ]}
+    doc = {'body': {'content': []}, 'headers': {'kix.h1': {'content': [{'endIndex': 13, 'paragraph': paragraph}]}}}
+
+    paragraphs = build_text_index(doc)
+
+    assert len(paragraphs) == 1
+    assert paragraphs[0].segment == ('', 'kix.h1')
+    assert paragraphs[0].text == 'Verbale Roma\n'
+    assert list(paragraphs[0].start_indexes) == [0, 7]
+    assert paragraphs[0].to_document_range(0, 7) == (0, 7)
+
+def test_single_run_header_is_kept():
+    paragraph = {'elements': [{'endIndex': 5, 'textRun': {'content': 'Roma\n'}}]}
+    index = index_paragraph(paragraph, ('', 'kix.h1'))
+    assert index.text == 'Roma\n'
+    assert list(index.start_indexes) == [0]
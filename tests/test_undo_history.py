@@ -0,0 +1,48 @@
+from functions.text_index import index_paragraph, make_range, range_segment
+from functions.undo_history import capture_styles, decode_level, encode_runs, inverse_requests
+
+HEADER = ('', 'kix.h1')
+FIELDS = ['bold', 'italic']
+
+def apply_requests(paragraphs, requests):
+    """Apply updateTextStyle requests to the text index, as the Docs API does to the document."""
+    updated = []
+    for paragraph in paragraphs:
+        for request in requests:
+            update = request['updateTextStyle']
+            if range_segment(update['range']) == paragraph.segment:
+                text_style = {field: update['textStyle'].get(field) for field in update['fields'].split(',')}
+                paragraph = paragraph.with_text_style(update['range']['startIndex'], update['range']['endIndex'], text_style)
+        updated.append(paragraph)
+    return updated
+
+def style_at(paragraph, index):
+    return next(paragraph.styles_between(index, index + 1))[2]
+
+def test_inverse_requests_restore_the_captured_styles():
+    body = index_paragraph({'elements': [
+        {'startIndex': 1, 'endIndex': 6, 'textRun': {'content': 'Roma ', 'textStyle': {}}},
+        {'startIndex': 6, 'endIndex': 13, 'textRun': {'content': 'Milano ', 'textStyle': {'bold': False, 'italic': True}}},
+        {'startIndex': 13, 'endIndex': 19, 'textRun': {'content': 'Ostia\n', 'textStyle': {'bold': True}}},
+    ]})
+    header = index_paragraph({'elements': [{'endIndex': 5, 'textRun': {'content': 'Bari\n', 'textStyle': {}}}]}, HEADER)
+    paragraphs = [body, header]
+    style = {'bold': True, 'italic': False}
+    requests = [
+        {'updateTextStyle': {'range': make_range(1, 12), 'textStyle': style, 'fields': 'bold,italic'}},
+        {'updateTextStyle': {'range': make_range(8, 18), 'textStyle': style, 'fields': 'bold,italic'}},  # Overlaps the first
+        {'updateTextStyle': {'range': make_range(0, 4, HEADER), 'textStyle': style, 'fields': 'bold,italic'}},
+    ]
+
+    runs_by_segment = capture_styles(paragraphs, [requests])
+    level = {'segments': [[tab_id, segment_id, encode_runs(runs)] for (tab_id, segment_id), runs in runs_by_segment.items()]}
+    assert decode_level(level) == runs_by_segment
+
+    formatted = apply_requests(paragraphs, requests)
+    assert style_at(formatted[0], 7) == {'bold': True, 'italic': False}
+    undone = apply_requests(formatted, inverse_requests(decode_level(level), FIELDS))
+
+    for original, restored in zip(paragraphs, undone):
+        first_index = original.start_indexes[0]
+        for index in range(first_index, first_index + len(original.text)):
+            assert style_at(restored, index) == style_at(original, index)
@@ -0,0 +1,50 @@
+from functions.doc_cache import document_cache
+from functions.watcher import DocumentWatcher
+from collaborative_http import CollaborativeHttp, fake_service
+
+TEXTS = ['roma e napoli\n', 'torino e bari\n', 'xxxxxx e pisa\n']
+
+def make_document():
+    content = [{'startIndex': 0, 'endIndex': 1, 'sectionBreak': {}}]
+    index = 1
+    for text in TEXTS:
+        element = {'startIndex': index, 'endIndex': index + len(text), 'textRun': {'content': text, 'textStyle': {}}}
+        content.append({'startIndex': index, 'endIndex': index + len(text), 'paragraph': {'elements': [element]}})
+        index += len(text)
+    return {'revisionId': 'rev-0', 'body': {'content': content}}
+
+def type_milano(document):
+    """A collaborator replaces 'xxxxxx' with 'Milano' in the last paragraph."""
+    run = document['body']['content'][3]['paragraph']['elements'][0]['textRun']
+    run['content'] = run['content'].replace('xxxxxx', 'Milano')
+
+def formatted_ranges(http, write):
+    _, body = http.batch_updates[write]
+    return [(request['updateTextStyle']['range']['startIndex'], request['updateTextStyle']['range']['endIndex']) for request in body['requests']]
+
+def test_edits_made_during_a_run_are_formatted_by_the_next_check(offline_api):
+    edits = [type_milano]
+    def collaborator_types(document_id):
+        if edits:
+            http.edit(document_id, edits.pop())
+    http = CollaborativeHttp({'doc': make_document()}, after_write=collaborator_types)
+    service = fake_service(http)
+    document_cache.invalidate('doc')
+    watcher = DocumentWatcher('doc', ['roma', 'Milano'], {'bold': True})
+
+    first = watcher.check(service)
+    assert first.changes_count == 1
+    assert formatted_ranges(http, 0) == [(1, 5)]
+    assert first.revision_id == 'rev-0'  # The copy that was searched, before the collaborator's edit
+    assert http.fetches == 1
+
+    second = watcher.check(service)
+    assert second is not None and second.changes_count == 1
+    milano_start = 1 + len(TEXTS[0]) + len(TEXTS[1])
+    assert formatted_ranges(http, 1) == [(milano_start, milano_start + len('Milano'))]
+    assert second.scanned_paragraphs == 1  # Only the paragraph the collaborator changed
+    assert http.fetches == 2  # No reload after the writes
+
+    assert watcher.check(service) is not None  # Our last write moved the revision: one more look, nothing to do
+    assert len(http.batch_updates) == 2
+    assert watcher.check(service) is None
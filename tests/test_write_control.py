@@ -0,0 +1,44 @@
+import pytest
+from googleapiclient.errors import HttpError
+from functions import google_docs
+from functions.doc_cache import document_cache
+from benchmarks.synthetic_docs import make_document, make_vocabulary
+from collaborative_http import CollaborativeHttp, fake_service
+
+@pytest.fixture
+def format_document(offline_api):
+    """Return a function formatting a synthetic document through a CollaborativeHttp, and the transport."""
+
+    def run(merge_edits=False, **options):
+        vocabulary = make_vocabulary(200)
+        http = CollaborativeHttp({'doc': make_document(40, vocabulary=vocabulary)}, **options)
+        document_cache.invalidate('doc')
+        try:
+            return http, google_docs.toggle_formatting(fake_service(http), 'doc', vocabulary[:20], {'bold': True}, merge_edits=merge_edits)
+        except HttpError as error:
+            return http, error
+    return run
+
+def test_retries_on_a_stale_revision(format_document):
+    http, changes_count = format_document(edits_before_write=1)
+    assert changes_count > 0
+    assert http.fetches == 2
+    assert len(http.batch_updates) == 1
+
+def test_gives_up_after_max_attempts(format_document):
+    http, result = format_document(edits_before_write=google_docs.MAX_ATTEMPTS)
+    assert isinstance(result, HttpError)
+    assert http.fetches == google_docs.MAX_ATTEMPTS
+
+def test_does_not_retry_an_invalid_request(format_document):
+    http, result = format_document(malformed=True)
+    assert isinstance(result, HttpError)
+    assert len(http.write_controls) == 1  # The revision did not change, so the 400 was not about an edit
+
+def test_merge_edits_targets_the_read_revision(format_document):
+    http, changes_count = format_document(merge_edits=True, edits_before_write=5)
+    assert changes_count > 0
+    assert http.fetches == 1
+    assert http.write_controls and all(control == {'targetRevisionId': 'rev-0'} for control in http.write_controls)
+    assert document_cache.get('doc') is None
+    assert google_docs.undo_history.count('doc') == 0
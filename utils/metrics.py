@@ -0,0 +1,179 @@
+import os
+import sys
+import json
+import time
+import cProfile
+import logging
+import threading
+from logging.handlers import RotatingFileHandler
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# Local log of the runs, one JSON object per line, rotated so it never grows past a few MB
+METRICS_FILE = "metrics.log"
+MAX_METRICS_BYTES = 1_000_000
+METRICS_BACKUPS = 3
+
+# Set BOLDER_METRICS=0 to disable the log, BOLDER_PROFILE=<file> to profile the next formatting run
+METRICS_ENABLED = os.environ.get("BOLDER_METRICS", "1") != "0"
+
+_logger: Optional[logging.Logger] = None
+_logger_lock = threading.Lock()
+_current = threading.local()
+_profile_path: Optional[str] = os.environ.get("BOLDER_PROFILE") or None
+_profile_lock = threading.Lock()
+
+def _metrics_logger() -> logging.Logger:
+    """Return the logger writing to the metrics file, creating it on first use."""
+    global _logger
+    with _logger_lock:
+        if _logger is None:
+            _logger = logging.getLogger("bolder.metrics")
+            _logger.setLevel(logging.INFO)
+            _logger.propagate = False
+            try:
+                handler = RotatingFileHandler(METRICS_FILE, maxBytes=MAX_METRICS_BYTES, backupCount=METRICS_BACKUPS, encoding="utf-8", delay=True)
+                handler.setFormatter(logging.Formatter("%(message)s"))
+                _logger.addHandler(handler)
+            except OSError as e:
+                print(f"Impossibile aprire il registro delle metriche: {e}")
+        return _logger
+
+def log_metrics(operation: str, **fields: Any) -> None:
+    """Append a record to the metrics log."""
+    if not METRICS_ENABLED:
+        return
+    record = {"time": time.strftime("%Y-%m-%dT%H:%M:%S"), "operation": operation, **fields}
+    _metrics_logger().info(json.dumps(record, default=str))
+
+class RunMetrics:
+    """
+    Timing spans and counters of a single operation, written to the metrics log when it ends.
+
+    Spans with the same name add up, so a phase repeated by a retry is counted once with its
+    total time. While the run is active in a thread, `count` calls made anywhere in that thread
+    (e.g. by the API client) are added to it.
+    """
+
+    def __init__(self, operation: str, **attributes: Any) -> None:
+        self.operation = operation
+        self.attributes = attributes
+        self.spans: Dict[str, float] = {}
+        self.counters: Dict[str, float] = {}
+        self.started = time.perf_counter()
+
+    @contextmanager
+    def span(self, name: str) -> Iterator[None]:
+        """Time the block as the span `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.spans[name] = self.spans.get(name, 0.0) + time.perf_counter() - started
+
+    def add(self, name: str, value: float = 1) -> None:
+        """Increment a counter of the run."""
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def finish(self, error: Optional[BaseException] = None) -> Dict[str, Any]:
+        """Write the run to the metrics log and return the record."""
+        record = {
+            **self.attributes,
+            "seconds": round(time.perf_counter() - self.started, 4),
+            "spans": {name: round(seconds, 4) for name, seconds in self.spans.items()},
+            "counters": self.counters,
+        }
+        if error is not None:
+            record["error"] = f"{type(error).__name__}: {error}"
+        log_metrics(self.operation, **record)
+        captured = getattr(_current, "captured", None)
+        if captured is not None:
+            captured.append({"operation": self.operation, **record})
+        return record
+
+@contextmanager
+def run_metrics(operation: str, **attributes: Any) -> Iterator[RunMetrics]:
+    """Collect the metrics of the block as the current run of the thread, logging them at its end."""
+    metrics = RunMetrics(operation, **attributes)
+    previous = getattr(_current, "metrics", None)
+    _current.metrics = metrics
+    try:
+        yield metrics
+    except BaseException as error:
+        metrics.finish(error)
+        raise
+    else:
+        metrics.finish()
+    finally:
+        _current.metrics = previous
+
+@contextmanager
+def capture_runs() -> Iterator[List[Dict[str, Any]]]:
+    """Collect the records of the runs finished in this thread inside the block, e.g. to read their spans."""
+    previous = getattr(_current, "captured", None)
+    _current.captured = records = []
+    try:
+        yield records
+    finally:
+        _current.captured = previous
+
+def count(name: str, value: float = 1) -> None:
+    """Increment a counter of the run active in this thread, if any."""
+    metrics = getattr(_current, "metrics", None)
+    if metrics is not None:
+        metrics.add(name, value)
+
+def request_profile(path: str) -> None:
+    """Ask for a cProfile dump of the next formatting run, written to `path`."""
+    global _profile_path
+    with _profile_lock:
+        _profile_path = path
+
+@contextmanager
+def profile_if_requested() -> Iterator[None]:
+    """Profile the block if a profile was requested and not taken yet, then dump it."""
+    global _profile_path
+    with _profile_lock:
+        path, _profile_path = _profile_path, None
+    if path is None:
+        yield
+        return
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        profiler.dump_stats(path)
+        print(f"Profilo salvato in {path}")
+
+def export_metrics(destination: str) -> int:
+    """
+    Copy the metrics log, including the rotated files, into a single JSON-lines file.
+
+    Args:
+        destination (str): The file to write, oldest records first.
+
+    Returns:
+        int: The number of records exported.
+    """
+    sources = [f"{METRICS_FILE}.{number}" for number in range(METRICS_BACKUPS, 0, -1)] + [METRICS_FILE]
+    exported = 0
+    with open(destination, "w", encoding="utf-8") as output:
+        for source in sources:
+            if not os.path.exists(source):
+                continue
+            with open(source, "r", encoding="utf-8") as file:
+                for line in file:
+                    if line.strip():
+                        output.write(line if line.endswith("\n") else line + "\n")
+                        exported += 1
+    return exported
+
+if __name__ == "__main__":
+    # python -m utils.metrics <destination>: export the metrics log
+    if len(sys.argv) != 2:
+        print("Uso: python -m utils.metrics <file di destinazione>")
+        sys.exit(1)
+    print(f"Record esportati: {export_metrics(sys.argv[1])}")
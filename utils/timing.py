@@ -0,0 +1,37 @@
+import time
+import threading
+from typing import Dict, List, Tuple
+
+# Target time between the start of the program and the window being shown
+STARTUP_TARGET_SECONDS = 1.0
+
+class StartupTimer:
+    """Records when each startup step completes, relative to the creation of the timer."""
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.marks: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def mark(self, step: str) -> None:
+        """Record that a step has completed. Safe to call from any thread."""
+        with self._lock:
+            self.marks.append((step, time.perf_counter() - self.started))
+
+    def elapsed(self, step: str) -> float:
+        """Return the time at which a step completed, or -1 if it did not complete yet."""
+        with self._lock:
+            return next((seconds for name, seconds in self.marks if name == step), -1.0)
+
+    def durations(self) -> Dict[str, float]:
+        """Return the time at which each step completed, in seconds."""
+        with self._lock:
+            return {name: round(seconds, 4) for name, seconds in self.marks}
+
+    def report(self) -> str:
+        """Return a summary of the startup steps, flagging a window shown after the target."""
+        with self._lock:
+            lines = [f"  {name}: {seconds * 1000:.0f} ms" for name, seconds in self.marks]
+        window_seconds = self.elapsed("window")
+        status = "OK" if 0 <= window_seconds <= STARTUP_TARGET_SECONDS else f"oltre l'obiettivo di {STARTUP_TARGET_SECONDS * 1000:.0f} ms"
+        return "Avvio di Bolder (" + status + "):\n" + "\n".join(lines)